@@ -0,0 +1,361 @@
+# benchmark.py
+# -------------------------------
+# Times the main processing stages on synthetic Flare topics (see
+# flare_corpus.py) and writes the results as JSON, so runs can be compared.
+# Grammar checks go to the LanguageTool stub (langtool_stub.py), started on
+# a free local port, so no Java or network access is needed.
+#
+# Examples:
+#   python benchmark.py --output bench.json
+#   python benchmark.py --nodes 100,1000,5000 --depth 2,5 --repeats 7
+#   python benchmark.py --issue-density 0.05,0.5 --stub-delay 0.02
+#
+# Regression gate: save a baseline, change the code, then compare. The
+# comparison re-runs the baseline's cases and exits with status 1 when a
+# stage got slower (or uses more memory) than the thresholds allow.
+#   python benchmark.py --nodes 1000,5000 --repeats 9 --output baseline.json
+#   python benchmark.py --baseline baseline.json --threshold 0.1
+# -------------------------------
+
+import argparse
+import itertools
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from dataclasses import asdict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import bs4
+import lxml.etree
+import pandas as pd
+
+from flare_corpus import CorpusConfig, generate_topic
+from grammar import GrammarConfig, configure_grammar, get_grammar_config
+from langtool_stub import start_stub_server
+from processors import (
+    _clear_mstp_memo, apply_langtool_to_nodes, apply_mstp_rules_to_nodes, apply_selected_changes,
+    dedupe_rows, extract_text_nodes, langtool_rows, mstp_rows, parse_html, render_diff_html,
+    rules_version, suggestions_frame,
+)
+
+# Version of the JSON layout written by this script
+RESULTS_SCHEMA = 2
+
+# Stages timed for every case, in pipeline order
+STAGES = (
+    "parse_html",
+    "extract_text_nodes",
+    "apply_mstp_rules_to_nodes",
+    "apply_langtool_to_nodes",
+    "apply_selected_changes",
+    "render_diff_html",
+)
+
+
+# -------------------------------
+# TIMING
+# -------------------------------
+def summarize(samples: Sequence[float]) -> Dict[str, Any]:
+    """
+    Summary statistics (seconds) of the timings of one stage.
+    """
+    if len(samples) > 1:
+        q1, _, q3 = statistics.quantiles(samples, n=4, method="inclusive")
+    else:
+        q1 = q3 = samples[0]
+    return {
+        "samples": list(samples),
+        "min": min(samples),
+        "median": statistics.median(samples),
+        "mean": statistics.fmean(samples),
+        "stdev": statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        "q1": q1,
+        "q3": q3,
+        "iqr": q3 - q1,
+    }
+
+
+def time_stage(run: Callable[[], Any], setup: Optional[Callable[[], Any]] = None,
+               repeats: int = 5, warmup: int = 1) -> List[float]:
+    """
+    Time run() `repeats` times after `warmup` untimed runs.
+    setup(), if given, runs untimed before every call.
+    """
+    samples = []
+    for i in range(warmup + repeats):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        run()
+        elapsed = time.perf_counter() - start
+        if i >= warmup:
+            samples.append(elapsed)
+    return samples
+
+
+def peak_memory(run: Callable[[], Any], setup: Optional[Callable[[], Any]] = None) -> int:
+    """
+    Peak bytes allocated by one run() call, measured with tracemalloc in a
+    separate, untimed run (tracing slows everything down).
+    """
+    if setup is not None:
+        setup()
+    tracemalloc.start()
+    try:
+        run()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+# -------------------------------
+# CASES
+# -------------------------------
+def bench_topic(topic: str, repeats: int, warmup: int) -> Dict[str, Dict[str, Any]]:
+    """
+    Time every stage on one topic. Each stage gets fresh input built outside
+    the timed call, and the MSTP memo is cleared before each MSTP run so
+    the rules really run.
+    """
+    soup = parse_html(topic)
+    nodes = extract_text_nodes(soup)
+    # Accept every suggestion
+    df = suggestions_frame(dedupe_rows(mstp_rows(nodes) + langtool_rows(nodes)))
+    changes: List = []
+    cleaned, _, _ = apply_selected_changes(parse_html(topic), df, source=topic, changes=changes)
+
+    state: Dict[str, Any] = {}
+
+    def fresh_soup():
+        state["soup"] = parse_html(topic)
+
+    # stage name -> (run, setup)
+    stages_to_run = {
+        "parse_html": (lambda: parse_html(topic), None),
+        "extract_text_nodes": (lambda: extract_text_nodes(soup), None),
+        "apply_mstp_rules_to_nodes": (lambda: apply_mstp_rules_to_nodes(nodes), _clear_mstp_memo),
+        "apply_langtool_to_nodes": (lambda: apply_langtool_to_nodes(nodes), None),
+        "apply_selected_changes": (lambda: apply_selected_changes(state["soup"], df, source=topic),
+                                   fresh_soup),
+        "render_diff_html": (lambda: render_diff_html(topic, cleaned, changes), None),
+    }
+    stages = {}
+    for name in STAGES:
+        run, setup = stages_to_run[name]
+        stages[name] = summarize(time_stage(run, setup, repeats, warmup))
+        stages[name]["peak_bytes"] = peak_memory(run, setup)
+    stages["apply_selected_changes"]["changes"] = len(changes)
+    return stages
+
+
+def bench_case(config: CorpusConfig, repeats: int, warmup: int) -> Dict[str, Any]:
+    topic = generate_topic(config)
+    nodes = extract_text_nodes(parse_html(topic))
+    return {
+        "case": config.label(),
+        "config": asdict(config),
+        "topic": {"chars": len(topic), "text_nodes": len(nodes)},
+        "stages": bench_topic(topic, repeats, warmup),
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                             timeout=10, check=True)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() or None
+
+
+def run_benchmarks(configs: Sequence[CorpusConfig], repeats: int = 5, warmup: int = 1,
+                   stub_delay: float = 0.0) -> Dict[str, Any]:
+    """
+    Run every case against a fresh LanguageTool stub and return the results
+    (see RESULTS_SCHEMA). The grammar settings are restored afterwards.
+    """
+    server, url = start_stub_server(delay=stub_delay)
+    previous = get_grammar_config()
+    # No grammar cache: every run sends its requests
+    configure_grammar(GrammarConfig(backend="local", server_url=url))
+    try:
+        cases = []
+        for config in configs:
+            print(f"  {config.label()}", file=sys.stderr)
+            cases.append(bench_case(config, repeats, warmup))
+    finally:
+        configure_grammar(previous)
+        server.shutdown()
+
+    return {
+        "schema": RESULTS_SCHEMA,
+        "meta": {
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "git_commit": _git_commit(),
+            "rules_version": rules_version(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "versions": {"beautifulsoup4": bs4.__version__, "lxml": lxml.etree.__version__,
+                         "pandas": pd.__version__},
+            "repeats": repeats,
+            "warmup": warmup,
+            "stub_delay": stub_delay,
+        },
+        "cases": cases,
+    }
+
+
+# -------------------------------
+# BASELINE COMPARISON
+# -------------------------------
+def baseline_configs(baseline: Dict[str, Any]) -> List[CorpusConfig]:
+    """The corpus settings of every case in a saved results file."""
+    return [CorpusConfig(**case["config"]) for case in baseline["cases"]]
+
+
+def compare_results(baseline: Dict[str, Any], current: Dict[str, Any],
+                    threshold: float = 0.1, memory_threshold: float = 0.1,
+                    min_seconds: float = 0.001) -> List[Dict[str, Any]]:
+    """
+    Compare every stage of every case found in both results.
+
+    A stage is a time regression when its median is more than `threshold`
+    (a fraction) above the baseline median, and the difference is larger
+    than both runs' interquartile ranges and `min_seconds`, so noise alone
+    does not fail the gate. Peak memory regresses when it grows by more than
+    `memory_threshold`. Returns one row per stage; `regression` lists what
+    got worse.
+    """
+    base_cases = {case["case"]: case for case in baseline["cases"]}
+    rows = []
+    for case in current["cases"]:
+        base = base_cases.get(case["case"])
+        if base is None:
+            continue
+        for name, stage in case["stages"].items():
+            old = base["stages"].get(name)
+            if old is None:
+                continue
+            diff = stage["median"] - old["median"]
+            noise = max(old.get("iqr", 0.0), stage.get("iqr", 0.0), min_seconds)
+            regression = []
+            if diff > old["median"] * threshold and diff > noise:
+                regression.append("time")
+            old_peak, peak = old.get("peak_bytes"), stage.get("peak_bytes")
+            if old_peak and peak and peak > old_peak * (1 + memory_threshold):
+                regression.append("memory")
+            rows.append({
+                "case": case["case"],
+                "stage": name,
+                "baseline_median": old["median"],
+                "median": stage["median"],
+                "time_change": diff / old["median"] if old["median"] else 0.0,
+                "baseline_peak_bytes": old_peak,
+                "peak_bytes": peak,
+                "memory_change": (peak - old_peak) / old_peak if old_peak and peak else 0.0,
+                "regression": regression,
+            })
+    return rows
+
+
+def format_comparison(rows: Sequence[Dict[str, Any]]) -> str:
+    lines = []
+    case = None
+    for row in rows:
+        if row["case"] != case:
+            case = row["case"]
+            lines.append(f"\n{case}")
+        flag = "  REGRESSION: " + ", ".join(row["regression"]) if row["regression"] else ""
+        lines.append(
+            f"  {row['stage']:<28} {row['baseline_median'] * 1000:9.2f} -> {row['median'] * 1000:9.2f} ms "
+            f"({row['time_change']:+7.1%})  peak {row['memory_change']:+7.1%}{flag}"
+        )
+    return "\n".join(lines)
+
+
+# -------------------------------
+# COMMAND LINE
+# -------------------------------
+def _numbers(kind):
+    def parse(value: str):
+        return [kind(v) for v in value.split(",") if v.strip()]
+    return parse
+
+
+def _parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the style checker on synthetic Flare topics.")
+    parser.add_argument("--nodes", type=_numbers(int), default=[100, 1000],
+                        help="text nodes per topic, comma separated (default: 100,1000)")
+    parser.add_argument("--depth", type=_numbers(int), default=[3],
+                        help="nesting depths, comma separated (default: 3)")
+    parser.add_argument("--issue-density", type=_numbers(float), default=[0.2],
+                        help="share of sentences with issues, comma separated (default: 0.2)")
+    parser.add_argument("--snippet-ratio", type=_numbers(float), default=[0.1],
+                        help="share of repeated snippet blocks, comma separated (default: 0.1)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--repeats", type=int, default=5, help="timed runs per stage (default: 5)")
+    parser.add_argument("--warmup", type=int, default=1, help="untimed runs per stage (default: 1)")
+    parser.add_argument("--stub-delay", type=float, default=0.0,
+                        help="seconds the LanguageTool stub waits per request, to mimic a real server")
+    parser.add_argument("--output", "-o", default="-", help="JSON file to write, or - for standard output")
+    parser.add_argument("--baseline", type=Path,
+                        help="results file to compare against; re-runs its cases instead of the ones above "
+                             "and exits with status 1 on a regression")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="allowed slowdown of a stage's median, as a fraction (default: 0.1)")
+    parser.add_argument("--memory-threshold", type=float, default=0.1,
+                        help="allowed growth of a stage's peak memory, as a fraction (default: 0.1)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = _parse_args(argv)
+    baseline = None
+    if args.baseline is not None:
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+        configs = baseline_configs(baseline)
+        # Same grammar latency as the baseline, or the timings don't compare
+        args.stub_delay = baseline["meta"].get("stub_delay", args.stub_delay)
+    else:
+        configs = [
+            CorpusConfig(nodes=n, depth=d, issue_density=i, snippet_ratio=s, seed=args.seed)
+            for n, d, i, s in itertools.product(args.nodes, args.depth, args.issue_density,
+                                                args.snippet_ratio)
+        ]
+    print(f"Running {len(configs)} benchmark cases", file=sys.stderr)
+    results = run_benchmarks(configs, args.repeats, args.warmup, args.stub_delay)
+
+    text = json.dumps(results, indent=2) + "\n"
+    if args.output == "-":
+        sys.stdout.write(text)
+    else:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+
+    if baseline is None:
+        for case in results["cases"]:
+            print(f"\n{case['case']} ({case['topic']['text_nodes']} text nodes)", file=sys.stderr)
+            for name, stage in case["stages"].items():
+                print(f"  {name:<28} median {stage['median'] * 1000:9.2f} ms "
+                      f"(IQR {stage['iqr'] * 1000:.2f} ms), peak {stage['peak_bytes'] / 1e6:.1f} MB",
+                      file=sys.stderr)
+        return 0
+
+    rows = compare_results(baseline, results, args.threshold, args.memory_threshold)
+    print(format_comparison(rows), file=sys.stderr)
+    regressions = [row for row in rows if row["regression"]]
+    if regressions:
+        print(f"\n{len(regressions)} stage(s) regressed against {args.baseline}", file=sys.stderr)
+        return 1
+    print(f"\nNo regressions against {args.baseline}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,471 @@
+# cli.py
+# -------------------------------
+# Command-line runner for whole MadCap Flare projects.
+# Checks every topic under the project's Content folder (*.htm, *.html)
+# and writes one combined report, optionally fixing the topics in place.
+#
+# Examples:
+#   python cli.py path/to/FlareProject --format csv --output report.csv
+#   python cli.py path/to/FlareProject --format jsonl --no-grammar
+#   python cli.py path/to/FlareProject --fix --fix-rules use-email,use-internet
+#   python cli.py path/to/FlareProject --jobs 0   (one worker process per CPU)
+#   python cli.py path/to/FlareProject --manifest .flare-style-manifest.json
+#       (only topics changed since the last run are checked again)
+#   python cli.py path/to/FlareProject --no-grammar --profile-rules table
+#       (what each MSTP rule costs on this project)
+# -------------------------------
+
+import argparse
+import codecs
+import hashlib
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+import pandas as pd
+
+import grammar
+from grammar import get_grammar_cache, get_grammar_config
+from processors import (
+    HTML_PARSERS, apply_mstp_rules_to_nodes, apply_selected_changes, default_html_parser,
+    extract_report_nodes, iter_findings, parse_html, rules_version, suggestions_frame,
+)
+from rule_engine import RuleProfiler
+
+TOPIC_SUFFIXES = (".htm", ".html")
+
+
+# -------------------------------
+# FINDING AND CHECKING TOPICS
+# -------------------------------
+def find_topics(project_dir: Path) -> List[Path]:
+    """
+    Return the topic files of a Flare project, sorted by path.
+    Looks in <project>/Content if it exists, otherwise in project_dir itself.
+    """
+    content = project_dir / "Content"
+    root = content if content.is_dir() else project_dir
+    return sorted(
+        p for p in root.rglob("*")
+        if p.is_file() and p.suffix.lower() in TOPIC_SUFFIXES
+    )
+
+
+def read_topic(path: Path) -> str:
+    """
+    Read a topic as text (UTF-8, with or without a byte order mark).
+    Line endings are kept as they are, so fixes can be written back without
+    touching the rest of the file.
+    """
+    return path.read_bytes().decode("utf-8-sig")
+
+
+def write_topic(path: Path, html: str):
+    """
+    Write a fixed topic back, keeping its byte order mark if it had one.
+    """
+    with open(path, "rb") as f:
+        bom = f.read(len(codecs.BOM_UTF8)) == codecs.BOM_UTF8
+    path.write_bytes(html.encode("utf-8-sig" if bom else "utf-8"))
+
+
+def check_topic(path: Path, root: Path, include_grammar: bool = True,
+                fix_rules: Optional[Sequence[str]] = None) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    Check one topic. If fix_rules is given, suggestions for those rules are
+    applied and the topic is rewritten in place.
+    Returns (suggestions with a "file" field, in node order; changes applied).
+    """
+    file = path.relative_to(root).as_posix()
+    content = read_topic(path)
+    # Report-only checks skip building a BeautifulSoup tree
+    soup = parse_html(content) if fix_rules is not None else None
+    records = [{"file": file, **f, "apply": True}
+               for f in iter_findings(soup if soup is not None else content, include_grammar)]
+    applied = 0
+    if fix_rules is not None and records:
+        df = pd.DataFrame(records)
+        df["apply"] = df["rule_id"].isin(fix_rules)
+        if df["apply"].any():
+            # Only the changed text is rewritten; the rest of the file stays as it was
+            html, applied, _ = apply_selected_changes(soup, df, source=content)
+            if applied:
+                write_topic(path, html)
+    return records, applied
+
+
+def profile_rules(topics: Sequence[Path]) -> RuleProfiler:
+    """
+    Run the MSTP rules over every topic with a RuleProfiler, without the
+    memo, so each rule's cost on the project's real text is measured.
+    Unreadable topics are skipped (the normal run reports them).
+    """
+    profiler = RuleProfiler()
+    for path in topics:
+        try:
+            nodes = extract_report_nodes(read_topic(path))
+        except Exception:
+            continue
+        apply_mstp_rules_to_nodes(nodes, profiler=profiler)
+    return profiler
+
+
+class TopicResult(NamedTuple):
+    """
+    Compact result for one topic, cheap to send back from a worker process.
+    - columns/rows: the suggestions as plain tuples (no DataFrame)
+    - error: message if the topic could not be checked
+    - complete: False if some grammar checks failed (see grammar.stats)
+    - cache_hits/cache_misses: grammar cache lookups made for this topic,
+      counted where it was checked (possibly in a worker process)
+    """
+    file: str
+    columns: Tuple[str, ...]
+    rows: List[Tuple[Any, ...]]
+    applied: int
+    error: Optional[str] = None
+    complete: bool = True
+    cache_hits: int = 0
+    cache_misses: int = 0
+
+
+def run_topic(path: Path, root: Path, include_grammar: bool = True,
+              fix_rules: Optional[Sequence[str]] = None) -> TopicResult:
+    """
+    check_topic, returning a TopicResult and catching errors.
+    """
+    file = path.relative_to(root).as_posix()
+    failed_before = grammar.stats.failed_texts
+    cache = get_grammar_cache() if include_grammar else None
+    hits_before, misses_before = (cache.hits, cache.misses) if cache is not None else (0, 0)
+    try:
+        records, applied = check_topic(path, root, include_grammar, fix_rules)
+    except Exception as e:
+        return TopicResult(file, (), [], 0, str(e))
+    complete = grammar.stats.failed_texts == failed_before
+    hits, misses = (cache.hits - hits_before, cache.misses - misses_before) if cache is not None else (0, 0)
+    columns = tuple(records[0]) if records else ()
+    return TopicResult(file, columns, [tuple(r.values()) for r in records],
+                       applied, complete=complete, cache_hits=hits, cache_misses=misses)
+
+
+# -------------------------------
+# WORKER PROCESSES
+# -------------------------------
+# Settings shared by every topic a worker checks, set once per process
+_worker_settings = {}
+
+
+def _init_worker(root: Path, include_grammar: bool, fix_rules: Optional[Sequence[str]]):
+    """
+    Runs once in each worker: store the settings and compile the MSTP rules
+    (rules_version() builds the rule engine if needed).
+    """
+    _worker_settings.update(root=root, include_grammar=include_grammar, fix_rules=fix_rules)
+    rules_version()
+
+
+def _run_topic_in_worker(path: Path) -> TopicResult:
+    return run_topic(path, **_worker_settings)
+
+
+def run_topics(topics: Sequence[Path], root: Path, include_grammar: bool,
+               fix_rules: Optional[Sequence[str]], jobs: int = 1) -> Iterator[TopicResult]:
+    """
+    Check all topics, yielding results in topic order as they are ready.
+    With jobs > 1 the topics are spread over that many worker processes
+    (parsing and regex checks are CPU bound).
+    """
+    if jobs <= 1 or len(topics) <= 1:
+        for p in topics:
+            yield run_topic(p, root, include_grammar, fix_rules)
+        return
+    jobs = min(jobs, len(topics))
+    chunksize = max(1, len(topics) // (jobs * 8))
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                             initargs=(root, include_grammar, fix_rules)) as pool:
+        yield from pool.map(_run_topic_in_worker, topics, chunksize=chunksize)
+
+
+# -------------------------------
+# MANIFEST FOR INCREMENTAL RUNS
+# -------------------------------
+# The manifest remembers, per topic, the hash of its content, the settings
+# it was checked with and the suggestions found. On the next run, topics
+# whose content and settings are unchanged reuse those suggestions.
+MANIFEST_VERSION = 1
+
+
+def file_digest(path: Path) -> str:
+    """
+    sha256 of a file's bytes.
+    """
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+def check_settings(include_grammar: bool) -> str:
+    """
+    Identifies everything besides the topic itself that changes its findings:
+    the MSTP rule set, the HTML parser and, if grammar is checked, the
+    grammar settings.
+    """
+    parts = [f"rules={rules_version()}", f"parser={default_html_parser()}"]
+    if include_grammar:
+        config = get_grammar_config()
+        parts.append(f"grammar={config.backend}/{config.language}/"
+                     f"{','.join(config.enabled_rules)}/{','.join(config.disabled_rules)}")
+    return "|".join(parts)
+
+
+def load_manifest(path: Path) -> Dict[str, Dict[str, Any]]:
+    """
+    Read the manifest's per-file entries; an unreadable or outdated
+    manifest counts as empty.
+    """
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    if data.get("version") != MANIFEST_VERSION:
+        return {}
+    return data.get("files", {})
+
+
+def save_manifest(path: Path, files: Dict[str, Dict[str, Any]]):
+    """
+    Write the manifest (to a temporary file first, so a crash cannot leave
+    a half-written manifest behind).
+    """
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps({"version": MANIFEST_VERSION, "files": files},
+                              ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def manifest_entry(result: TopicResult, digest: str, settings: str) -> Dict[str, Any]:
+    return {
+        "sha256": digest,
+        "settings": settings,
+        "columns": list(result.columns),
+        "rows": [list(row) for row in result.rows],
+    }
+
+
+def cached_result(entry: Optional[Dict[str, Any]], file: str, digest: str,
+                  settings: str) -> Optional[TopicResult]:
+    """
+    Rebuild a TopicResult from a manifest entry if it is still valid.
+    """
+    if not entry or entry.get("sha256") != digest or entry.get("settings") != settings:
+        return None
+    return TopicResult(file, tuple(entry["columns"]), [tuple(row) for row in entry["rows"]], 0)
+
+
+def _has_fixes(result: TopicResult, fix_rules: Sequence[str]) -> bool:
+    if "rule_id" not in result.columns:
+        return False
+    i = result.columns.index("rule_id")
+    return any(row[i] in fix_rules for row in result.rows)
+
+
+def run_incremental(topics: Sequence[Path], root: Path, include_grammar: bool,
+                    fix_rules: Optional[Sequence[str]], jobs: int,
+                    manifest_path: Path, counts: Dict[str, int]) -> Iterator[TopicResult]:
+    """
+    Like run_topics, but reuses the findings in the manifest for topics that
+    have not changed, and updates the manifest once all results are out.
+    Topics with fixes to apply are always checked again.
+    The number of reused topics is stored in counts["reused"].
+    """
+    old = load_manifest(manifest_path)
+    settings = check_settings(include_grammar)
+    results: List[Optional[TopicResult]] = []
+    digests, todo = [], []
+    for path in topics:
+        file = path.relative_to(root).as_posix()
+        digest = file_digest(path)
+        hit = cached_result(old.get(file), file, digest, settings)
+        if hit is not None and fix_rules is not None and _has_fixes(hit, fix_rules):
+            hit = None
+        digests.append(digest)
+        results.append(hit)
+        if hit is None:
+            todo.append(path)
+
+    counts["reused"] = len(topics) - len(todo)
+    fresh = run_topics(todo, root, include_grammar, fix_rules, jobs)
+    new_files = {}
+    for hit, digest in zip(results, digests):
+        r = hit if hit is not None else next(fresh)
+        # Skip failed or partly checked topics, and fixed ones (their content has changed)
+        if r.error is None and r.complete and r.applied == 0:
+            new_files[r.file] = manifest_entry(r, digest, settings)
+        yield r
+    save_manifest(manifest_path, new_files)
+
+
+# -------------------------------
+# REPORTS
+# -------------------------------
+def results_frame(results: Sequence[TopicResult]):
+    """
+    Build one DataFrame of suggestions from the results of all topics.
+    """
+    columns = next((r.columns for r in results if r.columns), ())
+    rows = [row for r in results if r.columns == columns for row in r.rows]
+    return suggestions_frame(rows, columns)
+
+
+def result_records(results: Iterable[TopicResult]) -> Iterator[Dict[str, Any]]:
+    """
+    Yield every suggestion of every topic as a dictionary, as results arrive.
+    """
+    for r in results:
+        for row in r.rows:
+            yield dict(zip(r.columns, row))
+
+
+def write_jsonl(records: Iterable[Dict[str, Any]], out) -> int:
+    """
+    Stream records to an open text stream, one JSON object per line.
+    Each topic's lines are flushed as soon as they are written, so a reader
+    (or a pipe) can start on them while the run continues.
+    Returns the number of records written.
+    """
+    count = 0
+    last_file = None
+    for record in records:
+        if record.get("file") != last_file:
+            out.flush()
+            last_file = record.get("file")
+        out.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+        count += 1
+    out.flush()
+    return count
+
+
+def write_report(df, fmt: str, out):
+    """
+    Write the combined suggestions to an open text stream as csv or json
+    (jsonl is streamed by write_jsonl instead).
+    """
+    if fmt == "csv":
+        df.to_csv(out, index=False)
+    else:
+        json.dump(df.to_dict("records"), out, ensure_ascii=False, indent=2, default=str)
+        out.write("\n")
+
+
+@contextmanager
+def _open_output(name: str):
+    if name == "-":
+        yield sys.stdout
+    else:
+        with open(name, "w", encoding="utf-8", newline="") as out:
+            yield out
+
+
+def _parse_args(argv):
+    parser = argparse.ArgumentParser(
+        description="Check a MadCap Flare project against MSTP and grammar rules."
+    )
+    parser.add_argument("project", type=Path, help="Flare project folder (or any folder of topics)")
+    parser.add_argument("--format", choices=["csv", "json", "jsonl"], default="csv",
+                        help="report format (default: csv)")
+    parser.add_argument("--output", "-o", default="-",
+                        help="report file, or - for standard output (default)")
+    parser.add_argument("--no-grammar", action="store_true",
+                        help="skip LanguageTool grammar checks")
+    parser.add_argument("--fix", action="store_true",
+                        help="apply fixes to the topics in place (needs --fix-rules)")
+    parser.add_argument("--fix-rules",
+                        help="comma-separated ids of the rules to fix, e.g. use-email,use-ok")
+    parser.add_argument("--jobs", "-j", type=int, default=1,
+                        help="worker processes to use; 0 means one per CPU (default: 1)")
+    parser.add_argument("--manifest", type=Path,
+                        help="manifest file for incremental runs: unchanged topics "
+                             "reuse the findings stored there")
+    parser.add_argument("--parser", choices=HTML_PARSERS,
+                        help="HTML parser (default: lxml, or $FLARE_HTML_PARSER)")
+    parser.add_argument("--fail-on-findings", action="store_true",
+                        help="exit with status 1 if anything was found")
+    parser.add_argument("--profile-rules", choices=["table", "json"],
+                        help="also time each MSTP rule over all topics and print the "
+                             "profile to standard error")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    args = _parse_args(argv)
+    if not args.project.is_dir():
+        print(f"Not a folder: {args.project}", file=sys.stderr)
+        return 2
+    if args.parser:
+        # Through the environment, so worker processes use it too
+        os.environ["FLARE_HTML_PARSER"] = args.parser
+
+    fix_rules = None
+    if args.fix:
+        # Many rules are only right in context (e.g. "which" -> "that"), so
+        # nothing is rewritten unattended unless it was asked for by name
+        if not args.fix_rules:
+            print("--fix needs --fix-rules: name the rules to apply", file=sys.stderr)
+            return 2
+        fix_rules = [r.strip() for r in args.fix_rules.split(",") if r.strip()]
+
+    jobs = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+    topics = find_topics(args.project)
+    # Before any fixes, so the profile is of the topics as they were
+    profiler = profile_rules(topics) if args.profile_rules else None
+    counts = {"reused": 0, "applied": 0, "cache_hits": 0, "cache_misses": 0}
+    if args.manifest:
+        results = run_incremental(topics, args.project, not args.no_grammar,
+                                  fix_rules, jobs, args.manifest, counts)
+    else:
+        results = run_topics(topics, args.project, not args.no_grammar, fix_rules, jobs)
+
+    def tally(results):
+        for r in results:
+            if r.error:
+                print(f"Could not check {r.file}: {r.error}", file=sys.stderr)
+            counts["applied"] += r.applied
+            counts["cache_hits"] += r.cache_hits
+            counts["cache_misses"] += r.cache_misses
+            yield r
+
+    try:
+        with _open_output(args.output) as out:
+            if args.format == "jsonl":
+                # Streamed: only one topic's findings are held at a time
+                found = write_jsonl(result_records(tally(results)), out)
+            else:
+                report = results_frame(list(tally(results)))
+                write_report(report, args.format, out)
+                found = len(report)
+    except BrokenPipeError:
+        # The reader stopped early (e.g. "| head"); stop quietly
+        sys.stdout = open(os.devnull, "w")
+        return 1
+
+    summary = f"Checked {len(topics)} topics: {found} suggestions"
+    if args.manifest:
+        summary += f", {counts['reused']} unchanged topics reused from the manifest"
+    if args.fix:
+        summary += f", {counts['applied']} changes applied"
+    if not args.no_grammar and get_grammar_config().cache_path:
+        # Added up from the topics: with --jobs the lookups happen in the workers
+        summary += f" (grammar cache: {counts['cache_hits']} hits, {counts['cache_misses']} misses)"
+    print(summary, file=sys.stderr)
+    if profiler is not None:
+        print(profiler.format_table() if args.profile_rules == "table" else profiler.to_json(),
+              file=sys.stderr)
+
+    return 1 if args.fail_on_findings and found else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
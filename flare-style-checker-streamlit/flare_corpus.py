@@ -0,0 +1,248 @@
+# flare_corpus.py
+# -------------------------------
+# Generates synthetic MadCap Flare topics for benchmarks and load tests.
+# Topics look like what Flare's XML editor saves: XHTML with MadCap:
+# elements and attributes (conditions, variables, snippets, cross-references,
+# drop-downs), nested lists and tables, and text that contains MSTP and
+# grammar issues at a configurable rate.
+#
+# Write a whole project with:
+#   python flare_corpus.py path/to/out --topics 200 --nodes 300 --depth 4
+# -------------------------------
+
+import argparse
+import html
+import random
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import List
+
+
+# -------------------------------
+# SETTINGS
+# -------------------------------
+@dataclass(frozen=True)
+class CorpusConfig:
+    """
+    Shape of the generated topics.
+    - nodes: text nodes (paragraphs, list items, cells...) per topic, roughly
+    - depth: how deep blocks are nested (div > ul > li > p ...)
+    - issue_density: share of sentences that contain an MSTP or grammar issue
+    - snippet_ratio: share of blocks that repeat shared snippet text, like
+      notes and boilerplate that appear in many topics
+    - sentences: sentences per paragraph, at most
+    - seed: random seed; the same settings always give the same topics
+    """
+    nodes: int = 200
+    depth: int = 3
+    issue_density: float = 0.2
+    snippet_ratio: float = 0.1
+    sentences: int = 3
+    seed: int = 1
+
+    def label(self) -> str:
+        return ",".join(f"{k}={v}" for k, v in asdict(self).items() if k != "seed")
+
+
+# -------------------------------
+# TEXT
+# -------------------------------
+CLEAN_SENTENCES = [
+    "Select the file that you want to import.",
+    "The dashboard shows the status of each device.",
+    "Enter a name for the new project.",
+    "Changes are saved automatically every five minutes.",
+    "To add a user, open the Users page and select Add.",
+    "The report lists all of the tasks that are due this week.",
+    "Use the search box to find a setting by name.",
+    "You can export the results as a CSV file.",
+    "If the connection fails, check the proxy settings and try again.",
+    "Each workspace can have its own members and permissions.",
+]
+
+# Sentences with MSTP issues (see mstp_rules.py) or issues the grammar
+# stub reports (repeated words, "alot", lowercase "i")
+ISSUE_SENTENCES = [
+    "Click on Save to keep your changes.",
+    "Send an e-mail to the administrator.",
+    "Please setup the device before you start.",
+    "Choose the option which you want.",
+    "Supported browsers are Chrome, Firefox and Edge.",
+    "Save & close the dialog box.",
+    "The file was created by the installer.",
+    "This is actually a very simple step.",
+    "Press ok to continue.",
+    "Open the settings in windows and restart the app.",
+    "You can utilize the API to automate this.",
+    "The the wizard opens in a new window.",
+    "This step takes alot of time on large projects.",
+    "If i remember correctly, the default port is 8080.",
+    "Log in with your company account and select Projects, Reports, etc.",
+    "After the download completes and the installer has checked the system, "
+    "the setup wizard copies the files and registers the services so that "
+    "everything is ready for you to use.",
+]
+
+# Text shared by many topics (notes, warnings, boilerplate)
+SNIPPET_TEXTS = [
+    "Note: You need administrator rights to change these settings.",
+    "Warning: Deleting a project cannot be undone.",
+    "Tip: Click on the help icon to open the documentation for this page.",
+    "For more information, contact your system administrator.",
+]
+
+HEADINGS = ["Overview", "Before you begin", "Install the agent", "Configure access",
+            "Troubleshooting", "Related tasks", "Set up notifications", "Reference"]
+
+CONDITIONS = ["Default.PrintOnly", "Default.ScreenOnly", "Product.Pro", "Product.Cloud"]
+
+
+# -------------------------------
+# TOPICS
+# -------------------------------
+class _TopicWriter:
+    """Builds one topic, keeping count of the text nodes written."""
+
+    def __init__(self, config: CorpusConfig, rng: random.Random):
+        self.config = config
+        self.rng = rng
+        self.nodes = 0
+        self.lines: List[str] = []
+
+    def sentence(self) -> str:
+        pool = ISSUE_SENTENCES if self.rng.random() < self.config.issue_density else CLEAN_SENTENCES
+        return self.rng.choice(pool)
+
+    def text(self) -> str:
+        count = self.rng.randint(1, max(1, self.config.sentences))
+        return html.escape(" ".join(self.sentence() for _ in range(count)), quote=False)
+
+    def emit(self, indent: int, line: str):
+        self.lines.append("    " * indent + line)
+
+    def inline(self) -> str:
+        """A paragraph body, sometimes with a variable or a cross-reference in it."""
+        self.nodes += 1
+        r = self.rng.random()
+        if r < 0.15:
+            self.nodes += 1
+            return (f'{self.text()} <MadCap:variable name="General.ProductName" /> '
+                    f"{self.text()}")
+        if r < 0.25:
+            self.nodes += 2
+            return (f'{self.text()} See <MadCap:xref href="Topic{self.rng.randint(0, 99):04d}.htm">'
+                    f"{self.rng.choice(HEADINGS)}</MadCap:xref>.")
+        return self.text()
+
+    def condition(self) -> str:
+        if self.rng.random() < 0.1:
+            return f' MadCap:conditions="{self.rng.choice(CONDITIONS)}"'
+        return ""
+
+    def block(self, indent: int, depth: int):
+        """One block; nested blocks go at most `depth` levels deeper."""
+        rng = self.rng
+        if rng.random() < self.config.snippet_ratio:
+            if rng.random() < 0.5:
+                self.emit(indent, '<MadCap:snippetBlock src="../Resources/Snippets/Note.flsnp" />')
+            else:
+                self.nodes += 1
+                self.emit(indent, f'<p class="note">{html.escape(rng.choice(SNIPPET_TEXTS), quote=False)}</p>')
+            return
+        kind = rng.random() if depth > 0 else 0.0
+        if kind < 0.55:
+            self.emit(indent, f"<p{self.condition()}>{self.inline()}</p>")
+        elif kind < 0.7:
+            self.emit(indent, f'<ol{self.condition()}>')
+            for _ in range(rng.randint(2, 4)):
+                self.emit(indent + 1, "<li>")
+                self.block(indent + 2, depth - 1)
+                self.emit(indent + 1, "</li>")
+            self.emit(indent, "</ol>")
+        elif kind < 0.8:
+            self.emit(indent, '<table style="width: 100%;">')
+            for _ in range(rng.randint(2, 3)):
+                self.emit(indent + 1, "<tr>")
+                for _ in range(2):
+                    self.nodes += 1
+                    self.emit(indent + 2, f"<td>{self.text()}</td>")
+                self.emit(indent + 1, "</tr>")
+            self.emit(indent, "</table>")
+        elif kind < 0.9:
+            self.nodes += 1
+            self.emit(indent, "<MadCap:dropDown>")
+            self.emit(indent + 1, "<MadCap:dropDownHead>")
+            self.emit(indent + 2, f"<MadCap:dropDownHotspot>{rng.choice(HEADINGS)}</MadCap:dropDownHotspot>")
+            self.emit(indent + 1, "</MadCap:dropDownHead>")
+            self.emit(indent + 1, "<MadCap:dropDownBody>")
+            self.block(indent + 2, depth - 1)
+            self.emit(indent + 1, "</MadCap:dropDownBody>")
+            self.emit(indent, "</MadCap:dropDown>")
+        else:
+            self.emit(indent, f'<div class="section"{self.condition()}>')
+            for _ in range(rng.randint(1, 3)):
+                self.block(indent + 1, depth - 1)
+            self.emit(indent, "</div>")
+
+
+def generate_topic(config: CorpusConfig, index: int = 0) -> str:
+    """
+    One topic as Flare XHTML. The same config and index give the same topic.
+    """
+    rng = random.Random(config.seed * 1_000_003 + index)
+    w = _TopicWriter(config, rng)
+    w.lines += [
+        '<?xml version="1.0" encoding="utf-8"?>',
+        '<html xmlns:MadCap="http://www.madcapsoftware.com/Schemas/MadCap.xsd">',
+        "    <head>",
+        '        <link href="../Resources/Stylesheets/Styles.css" rel="stylesheet" type="text/css" />',
+        "    </head>",
+        "    <body>",
+        f"        <h1>{rng.choice(HEADINGS)}</h1>",
+    ]
+    w.nodes += 1
+    while w.nodes < config.nodes:
+        if rng.random() < 0.08:
+            w.nodes += 1
+            w.emit(2, f"<h2>{rng.choice(HEADINGS)}</h2>")
+        w.block(2, config.depth)
+    w.lines += ["    </body>", "</html>", ""]
+    return "\n".join(w.lines)
+
+
+def write_project(out_dir: Path, config: CorpusConfig, topics: int) -> List[Path]:
+    """
+    Write a Flare-like project: Content/Topics/TopicNNNN.htm plus the shared
+    snippet. Returns the topic paths.
+    """
+    content = Path(out_dir) / "Content"
+    (content / "Topics").mkdir(parents=True, exist_ok=True)
+    (content / "Resources" / "Snippets").mkdir(parents=True, exist_ok=True)
+    (content / "Resources" / "Snippets" / "Note.flsnp").write_text(
+        '<?xml version="1.0" encoding="utf-8"?>\n'
+        '<html xmlns:MadCap="http://www.madcapsoftware.com/Schemas/MadCap.xsd">\n'
+        f"    <body>\n        <p>{html.escape(SNIPPET_TEXTS[0], quote=False)}</p>\n    </body>\n</html>\n",
+        encoding="utf-8",
+    )
+    paths = []
+    for i in range(topics):
+        path = content / "Topics" / f"Topic{i:04d}.htm"
+        path.write_text(generate_topic(config, i), encoding="utf-8")
+        paths.append(path)
+    return paths
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a synthetic Flare project.")
+    parser.add_argument("out", type=Path, help="project folder to write")
+    parser.add_argument("--topics", type=int, default=50)
+    parser.add_argument("--nodes", type=int, default=CorpusConfig.nodes)
+    parser.add_argument("--depth", type=int, default=CorpusConfig.depth)
+    parser.add_argument("--issue-density", type=float, default=CorpusConfig.issue_density)
+    parser.add_argument("--snippet-ratio", type=float, default=CorpusConfig.snippet_ratio)
+    parser.add_argument("--seed", type=int, default=CorpusConfig.seed)
+    args = parser.parse_args()
+    config = CorpusConfig(nodes=args.nodes, depth=args.depth, issue_density=args.issue_density,
+                          snippet_ratio=args.snippet_ratio, seed=args.seed)
+    paths = write_project(args.out, config, args.topics)
+    print(f"Wrote {len(paths)} topics to {args.out / 'Content'}")
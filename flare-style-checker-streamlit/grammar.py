@@ -0,0 +1,564 @@
+# grammar.py
+# -------------------------------
+# This file owns the LanguageTool grammar backend.
+# The backend is expensive to create, so it is built lazily on first use
+# (or warmed up in a background thread) instead of when processors.py is
+# imported. That keeps Streamlit cold starts fast.
+#
+# Which backend is used is read from environment variables:
+#   FLARE_GRAMMAR_BACKEND   "public" (default), "local" or "none"
+#   FLARE_LANGUAGETOOL_URL  URL of the local server (default http://localhost:8081)
+#   FLARE_GRAMMAR_LANGUAGE  language code (default en-US)
+#   FLARE_GRAMMAR_BATCH_CHARS  max characters sent in one request (default 15000)
+#   FLARE_GRAMMAR_CONCURRENCY  number of requests sent in parallel (default 4)
+#   FLARE_GRAMMAR_TIMEOUT      seconds to wait for one request (default 30)
+#   FLARE_GRAMMAR_RETRIES      retries for a failed request (default 2)
+#   FLARE_GRAMMAR_ENABLED_RULES / FLARE_GRAMMAR_DISABLED_RULES
+#                              comma-separated LanguageTool rule ids
+#   FLARE_GRAMMAR_CACHE        path of an on-disk result cache (off if unset;
+#                              only used with a backend that reports its version)
+#   FLARE_GRAMMAR_CACHE_SIZE   max entries kept in that cache (default 200000)
+# -------------------------------
+
+import logging
+import os
+import threading
+import time
+from bisect import bisect_right
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+# -------------------------------
+# CONFIGURATION
+# -------------------------------
+@dataclass
+class GrammarConfig:
+    """
+    Settings for the grammar backend.
+    - backend: "public" (LanguageTool public API), "local" (a LanguageTool
+      server you host, or langtool_stub.py) or "none" (skip grammar checks)
+    - server_url: base URL of the local server
+    - language: language code sent with every check
+    - pool_size: number of keep-alive connections kept open to the server
+    - timeout: seconds to wait for one request
+    - batch_chars: max characters of text packed into one request
+    - concurrency: max number of requests in flight at once
+    - retries: how often a failed request is retried
+    - backoff: seconds to wait before the first retry (doubled each time)
+    - enabled_rules / disabled_rules: LanguageTool rule ids to turn on / off
+    - cache_path: SQLite file for cached results ("" = no cache)
+    - cache_max_entries: entries kept before the least recently used go
+    """
+    backend: str = "public"
+    server_url: str = "http://localhost:8081"
+    language: str = "en-US"
+    pool_size: int = 8
+    timeout: float = 30.0
+    batch_chars: int = 15000
+    concurrency: int = 4
+    retries: int = 2
+    backoff: float = 0.5
+    enabled_rules: Tuple[str, ...] = ()
+    disabled_rules: Tuple[str, ...] = ()
+    cache_path: str = ""
+    cache_max_entries: int = 200_000
+
+    @classmethod
+    def from_env(cls) -> "GrammarConfig":
+        """
+        Read the configuration from FLARE_* environment variables.
+        """
+        return cls(
+            backend=os.environ.get("FLARE_GRAMMAR_BACKEND", cls.backend).lower(),
+            server_url=os.environ.get("FLARE_LANGUAGETOOL_URL", cls.server_url),
+            language=os.environ.get("FLARE_GRAMMAR_LANGUAGE", cls.language),
+            batch_chars=int(os.environ.get("FLARE_GRAMMAR_BATCH_CHARS", cls.batch_chars)),
+            concurrency=int(os.environ.get("FLARE_GRAMMAR_CONCURRENCY", cls.concurrency)),
+            timeout=float(os.environ.get("FLARE_GRAMMAR_TIMEOUT", cls.timeout)),
+            retries=int(os.environ.get("FLARE_GRAMMAR_RETRIES", cls.retries)),
+            enabled_rules=_split_ids(os.environ.get("FLARE_GRAMMAR_ENABLED_RULES", "")),
+            disabled_rules=_split_ids(os.environ.get("FLARE_GRAMMAR_DISABLED_RULES", "")),
+            cache_path=os.environ.get("FLARE_GRAMMAR_CACHE", cls.cache_path),
+            cache_max_entries=int(os.environ.get("FLARE_GRAMMAR_CACHE_SIZE", cls.cache_max_entries)),
+        )
+
+
+def _split_ids(value: str) -> Tuple[str, ...]:
+    return tuple(sorted(x.strip() for x in value.split(",") if x.strip()))
+
+
+# -------------------------------
+# LOCAL SERVER BACKEND
+# -------------------------------
+@dataclass
+class GrammarMatch:
+    """
+    One grammar issue found in a text.
+    Attribute names follow language_tool_python's Match, so both backends
+    can be used in the same way.
+    """
+    offset: int
+    errorLength: int
+    ruleId: str
+    message: str
+    replacements: List[str] = field(default_factory=list)
+
+
+class LocalServerBackend:
+    """
+    Talks to a LanguageTool HTTP server (POST /v2/check).
+    Uses one requests.Session with a connection pool, so consecutive checks
+    reuse open keep-alive connections instead of reconnecting every time.
+    """
+
+    def __init__(self, server_url: str, language: str = "en-US",
+                 pool_size: int = 8, timeout: float = 30.0,
+                 enabled_rules: Sequence[str] = (), disabled_rules: Sequence[str] = ()):
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.check_url = server_url.rstrip("/") + "/v2/check"
+        self.language = language
+        self.timeout = timeout
+        self.params = {"language": language}
+        if enabled_rules:
+            self.params["enabledRules"] = ",".join(enabled_rules)
+        if disabled_rules:
+            self.params["disabledRules"] = ",".join(disabled_rules)
+        self._version: Optional[str] = None
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def check(self, text: str) -> List[GrammarMatch]:
+        """
+        Check one text and return its matches.
+        Raises requests exceptions if the server cannot be reached.
+        """
+        response = self.session.post(
+            self.check_url,
+            data={"text": text, **self.params},
+            timeout=self.timeout,
+        )
+        response.raise_for_status()
+        body = response.json()
+        if self._version is None:
+            self._version = body.get("software", {}).get("version", "")
+        return [
+            GrammarMatch(
+                offset=m["offset"],
+                errorLength=m["length"],
+                ruleId=m.get("rule", {}).get("id", ""),
+                message=m.get("message", ""),
+                replacements=[r["value"] for r in m.get("replacements", [])],
+            )
+            for m in body.get("matches", [])
+        ]
+
+    @property
+    def version(self) -> str:
+        """
+        LanguageTool version reported by the server (asks it if needed).
+        """
+        if self._version is None:
+            self.check("a")
+        return self._version
+
+    def close(self):
+        self.session.close()
+
+
+# -------------------------------
+# LAZY BACKEND ACCESSOR
+# -------------------------------
+_config = GrammarConfig.from_env()
+_backend: Optional[Any] = None
+_backend_lock = threading.Lock()
+_backend_ready = threading.Event()
+_cache: Optional[Any] = None
+# Separate from _backend_lock, which is held while LanguageTool starts up
+_cache_lock = threading.Lock()
+_warmup: Optional[threading.Thread] = None
+_warmup_lock = threading.Lock()
+
+
+def _build_backend() -> Optional[Any]:
+    """
+    Create the grammar backend selected in the configuration.
+    Returns None if LanguageTool is not installed or cannot start,
+    in which case grammar checks are skipped.
+    """
+    try:
+        if _config.backend == "none":
+            return None
+        if _config.backend == "local":
+            return LocalServerBackend(
+                _config.server_url, _config.language,
+                pool_size=max(_config.pool_size, _config.concurrency),
+                timeout=_config.timeout,
+                enabled_rules=_config.enabled_rules,
+                disabled_rules=_config.disabled_rules,
+            )
+        import language_tool_python
+        lt = language_tool_python.LanguageToolPublicAPI(_config.language)
+        lt.enabled_rules.update(_config.enabled_rules)
+        lt.disabled_rules.update(_config.disabled_rules)
+        return lt
+    except Exception:
+        return None
+
+
+def configure_grammar(config: GrammarConfig):
+    """
+    Switch to a different grammar backend configuration.
+    The new backend is built lazily on the next grammar check.
+    """
+    global _config, _backend, _cache
+    with _backend_lock, _cache_lock:
+        old, old_cache = _backend, _cache
+        _config = config
+        _backend = None
+        _cache = None
+        _backend_ready.clear()
+    if isinstance(old, LocalServerBackend):
+        old.close()
+    if old_cache is not None:
+        old_cache.close()
+
+
+def get_grammar_backend() -> Optional[Any]:
+    """
+    Return the shared grammar backend, building it on first use.
+    Safe to call from several threads: only one of them builds it.
+    """
+    global _backend
+    if _backend_ready.is_set():
+        return _backend
+    with _backend_lock:
+        if not _backend_ready.is_set():
+            _backend = _build_backend()
+            _backend_ready.set()
+    return _backend
+
+
+def grammar_backend_ready() -> bool:
+    """
+    True once the backend has been built (or found to be unavailable).
+    """
+    return _backend_ready.is_set()
+
+
+def warm_grammar_backend() -> threading.Thread:
+    """
+    Start building the grammar backend in a background thread so that
+    the first grammar check does not pay the start-up cost.
+    While that thread runs, or once the backend is built, calling this
+    again returns the same thread instead of starting another one.
+    """
+    global _warmup
+    with _warmup_lock:
+        if _warmup is None or not (_warmup.is_alive() or _backend_ready.is_set()):
+            _warmup = threading.Thread(
+                target=get_grammar_backend, name="grammar-warmup", daemon=True
+            )
+            _warmup.start()
+        return _warmup
+
+
+def get_grammar_config() -> GrammarConfig:
+    """
+    Return the configuration currently in use.
+    """
+    return _config
+
+
+def get_grammar_cache():
+    """
+    Return the shared on-disk result cache (see grammar_cache.py),
+    or None if FLARE_GRAMMAR_CACHE / cache_path is not set.
+    Does not wait for the backend to be built.
+    """
+    global _cache
+    if not _config.cache_path:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            from grammar_cache import GrammarCache
+            _cache = GrammarCache(_config.cache_path, _config.cache_max_entries)
+    return _cache
+
+
+# -------------------------------
+# BATCHED CHECKING
+# -------------------------------
+# Texts are joined with a blank line, which LanguageTool treats as a
+# paragraph break, so one request can check many text nodes at once.
+BATCH_SEPARATOR = "\n\n"
+
+
+@dataclass
+class GrammarBatch:
+    """
+    Several texts joined into one request.
+    - text: the joined text sent to LanguageTool
+    - indexes: positions of the joined texts in the caller's list
+    - starts: offset of each joined text inside `text`
+    """
+    text: str
+    indexes: List[int]
+    starts: List[int]
+
+
+def make_batches(texts: Sequence[str], max_chars: int) -> List[GrammarBatch]:
+    """
+    Pack texts, in order, into batches of at most max_chars characters.
+    A text longer than max_chars gets a batch of its own.
+    """
+    batches = []
+    parts, indexes, starts, size = [], [], [], 0
+    for i, text in enumerate(texts):
+        extra = len(text) + (len(BATCH_SEPARATOR) if parts else 0)
+        if parts and size + extra > max_chars:
+            batches.append(GrammarBatch(BATCH_SEPARATOR.join(parts), indexes, starts))
+            parts, indexes, starts, size = [], [], [], 0
+            extra = len(text)
+        starts.append(size + (len(BATCH_SEPARATOR) if parts else 0))
+        parts.append(text)
+        indexes.append(i)
+        size += extra
+    if parts:
+        batches.append(GrammarBatch(BATCH_SEPARATOR.join(parts), indexes, starts))
+    return batches
+
+
+def split_batch_matches(batch: GrammarBatch, texts: Sequence[str],
+                        matches) -> List[List[GrammarMatch]]:
+    """
+    Map the matches found in a batch back to the texts it was built from.
+    Returns one list of matches per text in the batch, with offsets relative
+    to that text. Matches that fall in or across a separator are dropped.
+    """
+    per_text: List[List[GrammarMatch]] = [[] for _ in batch.indexes]
+    for m in matches:
+        slot = bisect_right(batch.starts, m.offset) - 1
+        if slot < 0:
+            continue
+        offset = m.offset - batch.starts[slot]
+        if offset + m.errorLength > len(texts[batch.indexes[slot]]):
+            continue
+        per_text[slot].append(GrammarMatch(
+            offset=offset,
+            errorLength=m.errorLength,
+            ruleId=m.ruleId,
+            message=m.message,
+            replacements=list(m.replacements),
+        ))
+    return per_text
+
+
+# -------------------------------
+# CONCURRENT CHECKING WITH RETRIES
+# -------------------------------
+@dataclass
+class GrammarStats:
+    """
+    Running totals for grammar checks, useful to see what a run cost.
+    - requests: requests sent to the backend (including retries)
+    - retries: requests that were retries of a failed one
+    - failed_batches: batches that still failed after all retries
+    - failed_texts: texts left unchecked because their requests failed
+    """
+    requests: int = 0
+    retries: int = 0
+    failed_batches: int = 0
+    failed_texts: int = 0
+
+    def __post_init__(self):
+        self._lock = threading.Lock()
+
+    def add(self, **counts: int):
+        with self._lock:
+            for name, value in counts.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def reset(self):
+        with self._lock:
+            for name in self.as_dict():
+                setattr(self, name, 0)
+
+    def as_dict(self):
+        return {name: value for name, value in vars(self).items() if not name.startswith("_")}
+
+
+# Totals for every check made in this process
+stats = GrammarStats()
+
+
+def _check_with_retry(backend, text: str, retries: int, backoff: float):
+    """
+    Call backend.check(text), retrying with exponential backoff.
+    Re-raises the last error if every attempt fails.
+    """
+    for attempt in range(retries + 1):
+        stats.add(requests=1, retries=1 if attempt else 0)
+        try:
+            return backend.check(text)
+        except Exception:
+            if attempt == retries:
+                raise
+            time.sleep(backoff * (2 ** attempt))
+
+
+# Texts in a row that must fail on their own before the backend is taken
+# to be down and the rest of the batch is skipped
+BACKEND_DOWN_AFTER = 3
+
+
+def _check_batch(backend, batch: GrammarBatch, texts: Sequence[str],
+                 config: GrammarConfig) -> List[Optional[List[GrammarMatch]]]:
+    """
+    Check one batch. If it keeps failing, fall back to checking its texts
+    one by one, so a single bad text does not lose the whole batch.
+    Texts that could not be checked get None instead of a list of matches.
+    """
+    try:
+        matches = _check_with_retry(backend, batch.text, config.retries, config.backoff)
+        return split_batch_matches(batch, texts, matches)
+    except Exception as exc:
+        stats.add(failed_batches=1)
+        logger.warning("Grammar check of %d texts failed (%s); checking them one by one.",
+                       len(batch.indexes), exc)
+
+    per_text: List[Optional[List[GrammarMatch]]] = [None for _ in batch.indexes]
+    if len(batch.indexes) == 1:
+        stats.add(failed_texts=1)
+        return per_text
+    failures = 0  # failed texts in a row
+    for slot, i in enumerate(batch.indexes):
+        try:
+            stats.add(requests=1)
+            per_text[slot] = list(backend.check(texts[i]))
+            failures = 0
+        except Exception as exc:
+            failures += 1
+            stats.add(failed_texts=1)
+            if failures >= BACKEND_DOWN_AFTER:
+                # Several texts in a row fail on their own: the backend is most likely down
+                rest = len(batch.indexes) - slot - 1
+                stats.add(failed_texts=rest)
+                logger.warning("Grammar backend unavailable (%s); skipping %d texts.", exc, rest)
+                return per_text
+            logger.warning("Grammar check failed for one text (%s); skipping it.", exc)
+    return per_text
+
+
+def _run_batches(backend, texts: Sequence[str], max_chars: int, concurrency: int,
+                 config: GrammarConfig) -> List[Optional[List[GrammarMatch]]]:
+    """
+    Batch the texts, send the batches on up to `concurrency` threads and
+    return matches per text in input order (None for texts that failed).
+    """
+    batches = make_batches(texts, max_chars)
+    if concurrency <= 1 or len(batches) <= 1:
+        found = [_check_batch(backend, b, texts, config) for b in batches]
+    else:
+        workers = min(concurrency, len(batches))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="grammar") as pool:
+            found = list(pool.map(lambda b: _check_batch(backend, b, texts, config), batches))
+
+    results: List[Optional[List[GrammarMatch]]] = [None for _ in texts]
+    for batch, per_text in zip(batches, found):
+        for i, matches in zip(batch.indexes, per_text):
+            results[i] = matches
+    return results
+
+
+def _cache_context(backend, config: GrammarConfig) -> Optional[str]:
+    """
+    Everything besides the text that changes a grammar result.
+    Returns None if the backend's version cannot be found out (for example
+    because the server is down, or for language_tool_python's public API,
+    which does not report one); results must not be cached then.
+    """
+    try:
+        version = getattr(backend, "version", None)
+    except Exception as exc:
+        logger.warning("Could not get the grammar backend version (%s); not using the cache.", exc)
+        return None
+    if not version:
+        logger.info("The grammar backend does not report its version; not using the cache.")
+        return None
+    return "|".join([
+        type(backend).__name__,
+        str(version),
+        config.language,
+        ",".join(config.enabled_rules),
+        ",".join(config.disabled_rules),
+    ])
+
+
+def _check_cached(backend, texts: Sequence[str], cache, context: str, max_chars: int,
+                  concurrency: int, config: GrammarConfig) -> List[List[GrammarMatch]]:
+    """
+    check_texts with an on-disk cache in front of the backend.
+    Texts are cached without their leading/trailing whitespace (so the same
+    words with different indentation share an entry), and each distinct
+    text not yet in the cache is sent only once.
+    context is the _cache_context of the backend.
+    """
+    from grammar_cache import cache_key
+
+    cores, leads, keys = [], [], []
+    for text in texts:
+        core = text.strip()
+        cores.append(core)
+        leads.append(len(text) - len(text.lstrip()))
+        keys.append(cache_key(core, context) if core else None)
+
+    known = cache.get_many(k for k in keys if k)
+    todo = {}
+    for key, core in zip(keys, cores):
+        if key and key not in known and key not in todo:
+            todo[key] = core
+    fresh = _run_batches(backend, list(todo.values()), max_chars, concurrency, config)
+    new_entries = [(key, m) for key, m in zip(todo, fresh) if m is not None]
+    cache.put_many(new_entries)
+    known.update(new_entries)
+
+    results: List[List[GrammarMatch]] = []
+    for key, lead in zip(keys, leads):
+        results.append([
+            GrammarMatch(m.offset + lead, m.errorLength, m.ruleId, m.message, list(m.replacements))
+            for m in known.get(key, [])
+        ])
+    return results
+
+
+def check_texts(backend, texts: Sequence[str],
+                max_chars: Optional[int] = None,
+                concurrency: Optional[int] = None,
+                cache=None) -> List[List[GrammarMatch]]:
+    """
+    Check many texts with as few requests as possible.
+    Batches are sent on up to `concurrency` threads (from the configuration
+    by default); failed requests are retried with backoff.
+    If a GrammarCache is given, cached results are reused and new ones stored.
+    Returns a list of matches for each text, in the same order as `texts`.
+    Texts whose requests keep failing get no matches and are counted in
+    `stats.failed_texts`.
+    """
+    config = _config
+    if max_chars is None:
+        max_chars = config.batch_chars
+    if concurrency is None:
+        concurrency = config.concurrency
+    context = _cache_context(backend, config) if cache is not None else None
+    if context is not None:
+        return _check_cached(backend, texts, cache, context, max_chars, concurrency, config)
+    results = _run_batches(backend, texts, max_chars, concurrency, config)
+    return [m if m is not None else [] for m in results]
@@ -0,0 +1,142 @@
+# grammar_cache.py
+# -------------------------------
+# This file stores grammar check results on disk, so text that repeats
+# across topics (snippets, variables, notes, "Click OK to continue") is sent
+# to LanguageTool only once.
+# Results live in a small SQLite database, keyed by a hash of the text and
+# of everything that can change the result (language, LanguageTool version,
+# enabled/disabled rules). The least recently used entries are removed once
+# the cache grows past max_entries.
+# -------------------------------
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+from grammar import GrammarMatch
+
+
+def cache_key(text: str, context: str) -> str:
+    """
+    Content hash for one text checked under `context`
+    (language, LanguageTool version and rule settings, see grammar.py).
+    """
+    h = hashlib.sha256()
+    h.update(context.encode("utf-8"))
+    h.update(b"\0")
+    h.update(text.encode("utf-8"))
+    return h.hexdigest()
+
+
+def _dump(matches: Sequence[GrammarMatch]) -> str:
+    return json.dumps([
+        [m.offset, m.errorLength, m.ruleId, m.message, list(m.replacements)[:5]]
+        for m in matches
+    ])
+
+
+def _load(data: str) -> List[GrammarMatch]:
+    return [GrammarMatch(*fields) for fields in json.loads(data)]
+
+
+class GrammarCache:
+    """
+    A size-bounded, least-recently-used cache of grammar matches in SQLite.
+    - get_many / put_many work on content keys from cache_key()
+    - hits, misses and evictions count what this process saw
+    """
+
+    def __init__(self, path: str, max_entries: int = 200_000):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS grammar_cache ("
+            " key TEXT PRIMARY KEY, matches TEXT NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS grammar_cache_last_used ON grammar_cache(last_used)"
+        )
+        self._db.commit()
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, List[GrammarMatch]]:
+        """
+        Look up several keys at once. Returns {key: matches} for the keys found.
+        """
+        keys = list(dict.fromkeys(keys))
+        found: Dict[str, List[GrammarMatch]] = {}
+        with self._lock:
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i + 500]
+                marks = ",".join("?" * len(chunk))
+                rows = self._db.execute(
+                    f"SELECT key, matches FROM grammar_cache WHERE key IN ({marks})", chunk
+                ).fetchall()
+                for key, data in rows:
+                    found[key] = _load(data)
+            if found:
+                now = time.time()
+                self._db.executemany(
+                    "UPDATE grammar_cache SET last_used = ? WHERE key = ?",
+                    [(now, key) for key in found],
+                )
+                self._db.commit()
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, items: Iterable[Tuple[str, Sequence[GrammarMatch]]]):
+        """
+        Store (key, matches) pairs, then evict the oldest entries if needed.
+        """
+        now = time.time()
+        rows = [(key, _dump(matches), now) for key, matches in items]
+        if not rows:
+            return
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO grammar_cache (key, matches, last_used) VALUES (?, ?, ?)",
+                rows,
+            )
+            (count,) = self._db.execute("SELECT COUNT(*) FROM grammar_cache").fetchone()
+            excess = count - self.max_entries
+            if excess > 0:
+                self._db.execute(
+                    "DELETE FROM grammar_cache WHERE key IN ("
+                    " SELECT key FROM grammar_cache ORDER BY last_used LIMIT ?)",
+                    (excess,),
+                )
+                self.evictions += excess
+            self._db.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM grammar_cache").fetchone()[0]
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Counters for this process, plus the number of stored entries.
+        """
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self),
+        }
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM grammar_cache")
+            self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
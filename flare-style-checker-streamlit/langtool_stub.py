@@ -0,0 +1,126 @@
+# langtool_stub.py
+# -------------------------------
+# A tiny stand-in for a LanguageTool server, for tests and local runs.
+# It answers POST /v2/check with the same JSON shape as LanguageTool,
+# using a handful of simple regex rules, so the "local" grammar backend
+# can be exercised without Java or network access.
+#
+# Run it with:  python langtool_stub.py --port 8081
+# -------------------------------
+
+import argparse
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Tuple
+from urllib.parse import parse_qs
+
+
+# -------------------------------
+# STUB RULES
+# -------------------------------
+# (rule id, message, pattern, replacement builder)
+STUB_RULES = [
+    ("ENGLISH_WORD_REPEAT_RULE", "Possible typo: you repeated a word.",
+     re.compile(r"\b(\w+)\s+\1\b", re.IGNORECASE), lambda m: m.group(1)),
+    ("WHITESPACE_RULE", "Possible typo: you repeated a whitespace.",
+     re.compile(r"(?<=\S) {2,}(?=\S)"), lambda m: " "),
+    ("ALOT", "Did you mean 'a lot'?",
+     re.compile(r"\balot\b", re.IGNORECASE), lambda m: "a lot"),
+    ("AT_LEAST", "Did you mean 'at least'?",
+     re.compile(r"\batleast\b", re.IGNORECASE), lambda m: "at least"),
+    ("I_LOWERCASE", "The personal pronoun 'I' should be uppercase.",
+     re.compile(r"\bi\b"), lambda m: "I"),
+]
+
+
+# Reported as "software" in every response, like LanguageTool does
+STUB_SOFTWARE = {"name": "LanguageTool stub", "version": "stub-1"}
+
+
+def check_text(text: str) -> List[Dict[str, Any]]:
+    """
+    Run the stub rules over `text` and return LanguageTool-style matches,
+    sorted by offset.
+    """
+    matches = []
+    for rule_id, message, pattern, repl in STUB_RULES:
+        for m in pattern.finditer(text):
+            matches.append({
+                "message": message,
+                "offset": m.start(),
+                "length": m.end() - m.start(),
+                "replacements": [{"value": repl(m)}],
+                "rule": {"id": rule_id},
+            })
+    matches.sort(key=lambda m: (m["offset"], m["rule"]["id"]))
+    return matches
+
+
+# -------------------------------
+# HTTP SERVER
+# -------------------------------
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real server
+    disable_nagle_algorithm = True  # headers and body go out without delay
+
+    def do_POST(self):
+        if self.path.split("?")[0] != "/v2/check":
+            self._send(404, {"error": "not found"})
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        form = parse_qs(self.rfile.read(length).decode("utf-8"), keep_blank_values=True)
+        text = form.get("text", [""])[0]
+        with self.server.lock:
+            self.server.request_count += 1
+        if self.server.delay:
+            time.sleep(self.server.delay)
+        self._send(200, {"software": STUB_SOFTWARE, "matches": check_text(text)})
+
+    def _send(self, status: int, body: Dict[str, Any]):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass  # keep test and benchmark output quiet
+
+
+def start_stub_server(host: str = "127.0.0.1", port: int = 0,
+                      delay: float = 0.0) -> Tuple[ThreadingHTTPServer, str]:
+    """
+    Start the stub server in a background thread.
+    - port=0 picks a free port
+    - delay adds a fixed wait to every request, to mimic network latency
+    Returns (server, base_url). Call server.shutdown() to stop it;
+    server.request_count holds the number of checks served.
+    """
+    server = ThreadingHTTPServer((host, port), _StubHandler)
+    server.daemon_threads = True
+    server.delay = delay
+    server.request_count = 0
+    server.lock = threading.Lock()
+    thread = threading.Thread(target=server.serve_forever, name="langtool-stub", daemon=True)
+    thread.start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a LanguageTool stub server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--delay", type=float, default=0.0,
+                        help="seconds to wait before answering each request")
+    args = parser.parse_args()
+    server, url = start_stub_server(args.host, args.port, args.delay)
+    print(f"LanguageTool stub listening on {url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -81,7 +81,8 @@ MSTP_RULES = [
     {
         "id": "serial-comma",
         "desc": "Add Oxford comma in lists (A, B, and C).",
-        "pattern": re.compile(r"(\w+,\s\w+)\sand\s(\w+)"),
+        # \b: matches start at a word, so a long word is not rescanned from every letter
+        "pattern": re.compile(r"\b(\w+,\s\w+)\sand\s(\w+)"),
         "repl": r"\1, and \2"
     },
     {
@@ -133,7 +134,9 @@ MSTP_RULES = [
     {
         "id": "short-sentences",
         "desc": "Prefer short, clear sentences.",
-        "pattern": re.compile(r"(.{120,}?)\.", re.IGNORECASE),
+        # Matches can only start where a sentence can: at a line start or
+        # after a full stop (same matches, but linear on long unpunctuated text)
+        "pattern": re.compile(r"(?:^|(?<=\.))(.{120,}?)\.", re.IGNORECASE | re.MULTILINE),
         "repl": ""  # Suggest manually
     },
     {
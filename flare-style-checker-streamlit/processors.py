@@ -4,23 +4,60 @@
 # checking grammar, applying MSTP rules, and updating the HTML.
 # -------------------------------
 
+import bisect
+import html
+import os
 import re
+import sys
+import threading
+import time
+import warnings
 import difflib  # For showing differences between original and cleaned HTML
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
 from dataclasses import dataclass
-from typing import List, Dict, Any, Tuple
+from functools import lru_cache
+from types import SimpleNamespace
+from typing import List, Dict, Any, Iterator, Optional, Tuple
 
 # BeautifulSoup is used to parse HTML and access text nodes
-from bs4 import BeautifulSoup, NavigableString
+from bs4 import (
+    BeautifulSoup, Comment, Declaration, Doctype, NavigableString, ProcessingInstruction, Tag,
+    XMLParsedAsHTMLWarning,
+)
+from bs4.builder import HTMLTreeBuilder
+
+# lxml is much faster than html.parser, but optional
+try:
+    from lxml import etree
+except ImportError:  # pragma: no cover - depends on the environment
+    etree = None
 
 # MSTP rules are defined in a separate file called mstp_rules.py
 from mstp_rules import MSTP_RULES
+from rule_engine import RuleProfiler, compile_rules, rules_fingerprint
 
-# Optional: LanguageTool for grammar and style checking
-try:
-    import language_tool_python
-    _lt = language_tool_python.LanguageToolPublicAPI('en-US')
-except Exception:
-    _lt = None  # If LanguageTool is not installed, grammar checks will be skipped
+# Optional: LanguageTool for grammar and style checking.
+# The backend is built lazily on first use (see grammar.py), so importing
+# this module does not wait for LanguageTool to start.
+from grammar import check_texts, get_grammar_backend, get_grammar_cache, get_grammar_config
+
+# All MSTP rules merged into one scanner (see rule_engine.py)
+_ENGINE = compile_rules(MSTP_RULES)
+
+# Name of the word-count "short sentences" check in rule profiles
+SHORT_SENTENCE_CHECK = "short-sentences (word count)"
+
+# How many distinct texts keep their MSTP results in memory
+MSTP_MEMO_SIZE = 50_000
+
+# Fields of one suggestion, in the order of suggestion rows and table columns
+SUGGESTION_COLUMNS = (
+    "type", "rule_id", "description", "path", "node_id", "start", "end", "before", "after",
+)
+
+# Columns with few distinct values, stored as pandas categoricals
+CATEGORY_COLUMNS = frozenset({"file", "type", "rule_id", "description", "path"})
 
 
 # -------------------------------
@@ -32,14 +69,145 @@ class TextNodeRef:
     Represents a piece of text in the HTML and its path for reference.
     - node: The actual text node (NavigableString)
     - path: CSS-like path showing where the text is in the HTML structure
+    - node_id: Position of the node in extraction order. Parsing the same
+      HTML again gives the same ids, so suggestions can point at their node
+      even when paths repeat (e.g. several <p> under one parent).
+    - line: Source line of the element holding the text; only set by
+      extract_report_nodes, where node is the plain text (str)
+    - source_span: (start, end, kind) of the text in the original source,
+      set by locate_text_nodes; kind is "text", "comment" or "cdata"
     """
     node: NavigableString
     path: str
+    node_id: int
+    line: Optional[int] = None
+    source_span: Optional[Tuple[int, int, str]] = None
+
+
+# -------------------------------
+# STAGE TIMINGS
+# -------------------------------
+class StageTimings:
+    """
+    Wall time and item counts of each processing stage, filled in by
+    process_html and process_html_streaming when one is passed in.
+    Stages are kept in the order they first ran; a stage that runs more
+    than once (e.g. dedupe) adds up. Safe to fill from several threads.
+    """
+
+    def __init__(self):
+        self.stages: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def add(self, name: str, seconds: float, count: Optional[int] = None):
+        with self._lock:
+            stage = self.stages.setdefault(name, {"seconds": 0.0, "count": None, "runs": 0})
+            stage["seconds"] += seconds
+            stage["runs"] += 1
+            if count is not None:
+                stage["count"] = (stage["count"] or 0) + count
+
+    def stage(self, name: str):
+        """Context manager timing one stage; set .count on the value it yields."""
+        return _timed(self, name)
+
+    def total(self) -> float:
+        with self._lock:
+            return sum(stage["seconds"] for stage in self.stages.values())
+
+    def to_frame(self):
+        """One row per stage: stage, seconds, count, runs."""
+        import pandas as pd
+
+        with self._lock:
+            rows = [dict(stage=name, **stage) for name, stage in self.stages.items()]
+        return pd.DataFrame(rows, columns=["stage", "seconds", "count", "runs"])
+
+
+@contextmanager
+def _timed(timings: Optional[StageTimings], name: str):
+    """
+    Time the block as stage `name` when timings is given. The block may set
+    .count on the yielded record (nodes, suggestions, rows...).
+    """
+    record = SimpleNamespace(count=None)
+    start = time.perf_counter()
+    yield record
+    if timings is not None:
+        timings.add(name, time.perf_counter() - start, record.count)
+
+
+# -------------------------------
+# PARSING HTML
+# -------------------------------
+# "lxml" is the default; "html.parser" is used when lxml is not installed.
+# The FLARE_HTML_PARSER environment variable overrides the default.
+HTML_PARSERS = ("lxml", "html.parser")
+
+
+def default_html_parser() -> str:
+    parser = os.environ.get("FLARE_HTML_PARSER", "lxml")
+    if parser not in HTML_PARSERS:
+        raise ValueError(f"Unknown HTML parser {parser!r}, expected one of {HTML_PARSERS}")
+    return parser if etree is not None or parser != "lxml" else "html.parser"
+
+
+def _parse_xhtml(content: str):
+    """
+    Parse content with lxml's XML parser if it starts with an XML declaration
+    and is well-formed XML, which is how Flare saves its topics and snippets.
+    Returns the root element, or None for anything else.
+    A leading byte order mark (which Flare writes) is ignored.
+    """
+    content = content.lstrip("\ufeff")
+    if not content.lstrip().startswith("<?xml"):
+        return None
+    try:
+        # Encode first: lxml refuses str input that has an encoding declaration
+        return etree.fromstring(content.encode("utf-8"), etree.XMLParser(resolve_entities=False))
+    except etree.XMLSyntaxError:
+        return None
+
+
+def parse_html(content: str, parser: Optional[str] = None) -> BeautifulSoup:
+    """
+    Parse a topic with the chosen parser (see HTML_PARSERS).
+    With lxml, Flare XHTML is read with lxml's XML parser: HTML parsers
+    (html.parser included) lowercase "MadCap:" tag and attribute names and
+    turn <MadCap:variable /> into an open/close pair, which Flare no longer
+    recognises once the topic is saved. Other HTML goes to lxml's HTML parser.
+    """
+    parser = parser or default_html_parser()
+    if parser not in HTML_PARSERS:
+        raise ValueError(f"Unknown HTML parser {parser!r}, expected one of {HTML_PARSERS}")
+    if parser == "lxml" and etree is not None:
+        if _parse_xhtml(content) is not None:
+            # Split "class" into a list like the HTML parsers do (used in paths)
+            return BeautifulSoup(content, "xml", multi_valued_attributes=
+                                 HTMLTreeBuilder.DEFAULT_CDATA_LIST_ATTRIBUTES)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", XMLParsedAsHTMLWarning)
+            return BeautifulSoup(content, "lxml")
+    return BeautifulSoup(content, "html.parser")
 
 
 # -------------------------------
 # HELPER FUNCTIONS
 # -------------------------------
+def _path_segment(tag) -> str:
+    """
+    The part of a path for one element: tag name plus #id and .classes.
+    """
+    # The XML parser keeps namespace prefixes apart ("MadCap" + "xref")
+    name = f"{tag.prefix}:{tag.name}" if tag.prefix else tag.name
+    if tag.get("id"):
+        name += f"#{tag.get('id')}"
+    if tag.get("class"):
+        cls = "." + ".".join(tag.get("class"))
+        name += cls
+    return name
+
+
 def _node_path(node) -> str:
     """
     Generate a CSS-like path string for a text node, useful for locating it.
@@ -48,13 +216,7 @@ def _node_path(node) -> str:
     parts = []
     curr = node.parent
     while curr and curr.name:
-        name = curr.name
-        if curr.get("id"):
-            name += f"#{curr.get('id')}"
-        if curr.get("class"):
-            cls = "." + ".".join(curr.get("class"))
-            name += cls
-        parts.append(name)
+        parts.append(_path_segment(curr))
         curr = curr.parent
     return " > ".join(reversed(parts))
 
@@ -63,18 +225,151 @@ def extract_text_nodes(soup: BeautifulSoup) -> List[TextNodeRef]:
     """
     Find all meaningful text nodes in the HTML, skipping scripts, styles, and very short text.
     Returns a list of TextNodeRef objects.
+    Paths are built in the same walk: each element's path is its parent's
+    path plus one segment, so it is computed once and shared (interned)
+    by all the text nodes inside it.
     """
     nodes = []
     blacklist = {"script", "style"}  # Ignore these tags
-    for text in soup.find_all(string=True):
-        if not isinstance(text, NavigableString):
+
+    # Path of every element seen so far, by id(); the root's comes from its ancestors
+    root_path = _node_path(soup)
+    if soup.name:
+        root_path = f"{root_path} > {_path_segment(soup)}" if root_path else _path_segment(soup)
+    paths = {id(soup): sys.intern(root_path)}
+
+    for el in soup.descendants:
+        if isinstance(el, Tag):
+            parent_path = paths[id(el.parent)]
+            segment = _path_segment(el)
+            paths[id(el)] = sys.intern(f"{parent_path} > {segment}" if parent_path else segment)
             continue
-        if text.parent and text.parent.name in blacklist:
+        if not isinstance(el, NavigableString):
             continue
-        raw = str(text)
+        if el.parent and el.parent.name in blacklist:
+            continue
+        raw = str(el)
         if not raw or raw.isspace() or len(raw.strip()) < 2:
             continue
-        nodes.append(TextNodeRef(node=text, path=_node_path(text)))
+        nodes.append(TextNodeRef(node=el, path=paths[id(el.parent)], node_id=len(nodes)))
+    return nodes
+
+
+def _lxml_segment(el, xml: bool) -> str:
+    """
+    _path_segment for an lxml element.
+    """
+    if xml:
+        name = etree.QName(el).localname
+        name = f"{el.prefix}:{name}" if el.prefix else name
+    else:
+        name = el.tag
+    if el.get("id"):
+        name += f"#{el.get('id')}"
+    classes = (el.get("class") or "").split()
+    if classes:
+        name += "." + ".".join(classes)
+    return name
+
+
+def _lxml_strings(root, xml: bool,
+                  doctype_line: Optional[int]) -> Iterator[Tuple[str, Any, str, Optional[int]]]:
+    """
+    Yield (text, parent element or None, parent path, line) for every string
+    in the tree, in the order BeautifulSoup lists them: the doctype, comments
+    and processing instructions included.
+    doctype_line is the source line of the <!DOCTYPE>, None if there is none
+    (lxml's HTML parser makes one up for documents without).
+    """
+    top = list(reversed(list(root.itersiblings(preceding=True))))
+    if doctype_line is not None:
+        # lxml does not keep the doctype in the tree: put it back in place
+        docinfo = root.getroottree().docinfo
+        doctype = Doctype.for_name_and_ids(docinfo.root_name, docinfo.public_id,
+                                           docinfo.system_url)
+        before = sum(1 for el in top if el.sourceline and el.sourceline <= doctype_line)
+        top.insert(before, doctype)
+    top += [root] + list(root.itersiblings())
+
+    # Depth-first walk over (node, parent element, parent path, line);
+    # plain strings on the stack are tails, the text lxml keeps after a node
+    stack = [(el, None, "[document]", None) for el in reversed(top)]
+    while stack:
+        el, parent, parent_path, line = stack.pop()
+        if isinstance(el, str):
+            yield str(el), parent, parent_path, line
+            continue
+        if el.tail:
+            stack.append((el.tail, parent, parent_path, el.sourceline))
+        if isinstance(el.tag, str):
+            path = sys.intern(f"{parent_path} > {_lxml_segment(el, xml)}")
+            if el.text:
+                yield el.text, el, path, el.sourceline
+            stack.extend((child, el, path, None) for child in reversed(el))
+        elif el.tag is etree.PI:
+            text = f"{el.target} {el.text}" if el.text else el.target
+            yield text, parent, parent_path, el.sourceline
+        else:  # comment
+            yield el.text or "", parent, parent_path, el.sourceline
+
+
+_DOCTYPE_RE = re.compile(r"<!DOCTYPE", re.IGNORECASE)
+
+
+def extract_report_nodes(content: str, parser: Optional[str] = None,
+                         timings: Optional[StageTimings] = None) -> List[TextNodeRef]:
+    """
+    extract_text_nodes for report-only checks: walks an lxml tree instead of
+    building a BeautifulSoup one, which takes a fraction of the time and
+    memory. Gives the same texts, paths and node ids as
+    extract_text_nodes(parse_html(content)), with node set to the plain text
+    and line to its element's source line. The nodes cannot be edited, so
+    changes are applied to a parsed soup as usual.
+    Falls back to BeautifulSoup when the parser is not lxml.
+    With timings, parsing and the walk are recorded as separate stages.
+    """
+    parser = parser or default_html_parser()
+    if parser != "lxml" or etree is None:
+        with _timed(timings, "parse") as stage:
+            soup = parse_html(content, parser)
+            stage.count = len(content)
+        with _timed(timings, "extract_text_nodes") as stage:
+            nodes = extract_text_nodes(soup)
+            stage.count = len(nodes)
+        return nodes
+
+    with _timed(timings, "parse") as stage:
+        stage.count = len(content)
+        root = _parse_xhtml(content)
+        xml = root is not None
+        if not xml:
+            html_parser = etree.HTMLParser(encoding="utf-8")
+            root = etree.fromstring(content.encode("utf-8"), html_parser)
+    if root is None:
+        return []
+
+    with _timed(timings, "extract_text_nodes") as stage:
+        nodes = _report_nodes(content, root, xml)
+        stage.count = len(nodes)
+    return nodes
+
+
+def _report_nodes(content: str, root, xml: bool) -> List[TextNodeRef]:
+    """
+    The walk of extract_report_nodes over a parsed lxml tree.
+    """
+    nodes = []
+    blacklist = {"script", "style"}  # Ignore these tags
+    doctype = _DOCTYPE_RE.search(content)
+    doctype_line = content.count("\n", 0, doctype.start()) + 1 if doctype else None
+    for raw, parent, path, line in _lxml_strings(root, xml, doctype_line):
+        if parent is not None:
+            name = etree.QName(parent).localname if xml else parent.tag
+            if name in blacklist:
+                continue
+        if not raw or raw.isspace() or len(raw.strip()) < 2:
+            continue
+        nodes.append(TextNodeRef(node=raw, path=path, node_id=len(nodes), line=line))
     return nodes
 
 
@@ -115,184 +410,813 @@ def suggest_active_voice(text: str) -> str:
     return text + " (Passive voice detected – consider rewriting in active voice)"
 
 
-def apply_mstp_rules_to_nodes(nodes: List[TextNodeRef]) -> List[Dict[str, Any]]:
+def rules_version() -> str:
+    """
+    Short hash identifying the current MSTP rule set, for cache keys.
+    """
+    return _current_engine().fingerprint
+
+
+def _current_engine():
+    """
+    Return the rule engine for the current MSTP_RULES.
+    If the rules were changed since the engine was built, rebuild it and
+    forget the memoized results.
+    """
+    global _ENGINE
+    if rules_fingerprint(MSTP_RULES) != _ENGINE.fingerprint:
+        _ENGINE = compile_rules(MSTP_RULES)
+        _rule_hits.cache_clear()
+    return _ENGINE
+
+
+def _find_rule_hits(original: str, profiler: Optional[RuleProfiler] = None
+                    ) -> Tuple[Tuple[str, str, int, int, str, str], ...]:
+    """
+    Run the MSTP rules over one text.
+    Returns (rule_id, description, start, end, before, after) for each
+    suggestion, where start/end are the offsets of `before` in the text.
+    """
+    hits = []
+
+    # Single pass through the compiled engine
+    for rule_id, (start, end) in _ENGINE.scan(original, profiler):
+        rule = _ENGINE.by_id[rule_id]
+        before = original[start:end]
+        if rule_id == "avoid-passive":
+            after = suggest_active_voice(before)
+        else:
+            after = rule["pattern"].sub(rule["repl"], before)
+        if before != after:
+            hits.append((rule_id, rule["desc"], start, end, before, after))
+
+    return tuple(hits)
+
+
+@lru_cache(maxsize=MSTP_MEMO_SIZE)
+def _rule_hits(original: str) -> Tuple[Tuple[str, str, int, int, str, str], ...]:
+    """
+    _find_rule_hits, memoized, so text repeated across nodes (table
+    headers, labels, snippets) is only checked once.
+    """
+    return _find_rule_hits(original)
+
+
+@lru_cache(maxsize=MSTP_MEMO_SIZE)
+def _short_sentence_hits(original: str) -> Tuple[Tuple[str, str, int, int, str, str], ...]:
+    """
+    The "short sentences" pseudo-rule for one text, in the same form as
+    _rule_hits. Memoized the same way.
+    """
+    shortened = enforce_short_sentences(original, max_words=20)
+    if shortened != original:
+        return (("short-sentences", f"Sentence exceeds 20 words, consider splitting.",
+                 0, len(original), original, shortened),)
+    return ()
+
+
+def _mstp_hits(original: str) -> Tuple[Tuple[str, str, int, int, str, str], ...]:
+    """
+    All MSTP suggestions for one text: the rules, then the short-sentence check.
+    """
+    return _rule_hits(original) + _short_sentence_hits(original)
+
+
+def _clear_mstp_memo():
+    """Forget all memoized MSTP results."""
+    _rule_hits.cache_clear()
+    _short_sentence_hits.cache_clear()
+
+
+def _mstp_rows(ref: TextNodeRef, hits=None) -> List[Tuple]:
+    """
+    MSTP suggestions for one text node, as rows (see SUGGESTION_COLUMNS).
+    hits are the node's _mstp_hits, if already known.
+    """
+    if hits is None:
+        hits = _mstp_hits(str(ref.node))
+    return [
+        ("MSTP", rule_id, description, ref.path, ref.node_id, start, end, before, after)
+        for rule_id, description, start, end, before, after in hits
+    ]
+
+
+def mstp_rows(nodes: List[TextNodeRef], timings: Optional[StageTimings] = None,
+              profiler: Optional[RuleProfiler] = None) -> List[Tuple]:
+    """
+    Apply MSTP rules to all text nodes: deduplicated suggestion rows.
+    With timings, the rules, the short-sentence check and dedupe are
+    recorded as separate stages. With a profiler, the memo is bypassed and
+    the cost of every rule on every node is recorded in it (see
+    rule_engine.RuleProfiler).
+    """
+    engine = _current_engine()
+    texts = [str(ref.node) for ref in nodes]
+    if profiler is not None:
+        profiler.add_rules(rule["id"] for rule in engine.rules)
+    with _timed(timings, "mstp_rules") as stage:
+        if profiler is None:
+            rule_hits = [_rule_hits(text) for text in texts]
+        else:
+            rule_hits = [_find_rule_hits(text, profiler) for text in texts]
+        stage.count = sum(map(len, rule_hits))
+    with _timed(timings, "short_sentences") as stage:
+        if profiler is None:
+            short_hits = [_short_sentence_hits(text) for text in texts]
+        else:
+            short_hits = [_profiled_short_sentence_hits(text, profiler) for text in texts]
+        stage.count = sum(map(len, short_hits))
+    rows = []
+    for ref, hits, short in zip(nodes, rule_hits, short_hits):
+        rows.extend(_mstp_rows(ref, hits + short))
+    with _timed(timings, "dedupe") as stage:
+        rows = dedupe_rows(rows)
+        stage.count = len(rows)
+    return rows
+
+
+def _profiled_short_sentence_hits(original: str, profiler: RuleProfiler):
+    start = time.perf_counter()
+    hits = _short_sentence_hits.__wrapped__(original)
+    profiler.record(SHORT_SENTENCE_CHECK, time.perf_counter() - start, len(hits), len(original))
+    return hits
+
+
+def apply_mstp_rules_to_nodes(nodes: List[TextNodeRef],
+                              profiler: Optional[RuleProfiler] = None) -> List[Dict[str, Any]]:
     """
     Apply MSTP rules to all text nodes and collect suggestions.
     Returns a list of dictionaries, each containing before/after text and rule info.
+    Pass a RuleProfiler to record what each rule costs (see mstp_rows).
     """
-    suggestions = []
-    for ref in nodes:
-        original = str(ref.node)
-        
-        # 1. Existing MSTP rules
-        for rule in MSTP_RULES:
-            for m in rule["pattern"].finditer(original):
-                before = m.group(0)
-                if rule["id"] == "avoid-passive":
-                    after = suggest_active_voice(before)
-                else:
-                    after = rule["pattern"].sub(rule["repl"], before)
-                if before != after:
-                    suggestions.append({
-                        "type": "MSTP",
-                        "rule_id": rule["id"],
-                        "description": rule["desc"],
-                        "path": ref.path,
-                        "before": before,
-                        "after": after,
-                        "apply": False
-                    })
-        
-        # 2. New "short sentences" pseudo-rule
-        shortened = enforce_short_sentences(original, max_words=20)
-        if shortened != original:
-            suggestions.append({
-                "type": "MSTP",
-                "rule_id": "short-sentences",
-                "description": f"Sentence exceeds 20 words, consider splitting.",
-                "path": ref.path,
-                "before": original,
-                "after": shortened,
-                "apply": False
-            })
-
-    return dedupe_suggestions(suggestions)
+    return _as_dicts(mstp_rows(nodes, profiler=profiler))
 
 
 # -------------------------------
 # GRAMMAR CHECK USING LANGUAGETOOL
 # -------------------------------
-def apply_langtool_to_nodes(nodes: List[TextNodeRef]) -> List[Dict[str, Any]]:
+def langtool_rows(nodes: List[TextNodeRef], timings: Optional[StageTimings] = None) -> List[Tuple]:
     """
     Use LanguageTool to find grammar mistakes in text nodes.
-    Returns a list of suggestions.
+    Text nodes are sent in batches, so a topic needs only a few requests,
+    and results are reused from the on-disk cache when one is configured.
+    Returns deduplicated suggestion rows.
+    With timings, the check (including starting the backend, if it was not
+    running yet) and dedupe are recorded as separate stages.
     """
-    if _lt is None:
-        return []
+    with _timed(timings, "grammar") as stage:
+        lt = get_grammar_backend()
+        if lt is None:
+            return []
 
-    suggestions = []
-    for ref in nodes:
-        text = str(ref.node)
-        try:
-            matches = _lt.check(text)
-        except Exception:
-            continue
+        texts = [str(ref.node) for ref in nodes]
+        rows = []
+        results = check_texts(lt, texts, cache=get_grammar_cache())
+        for ref, text, matches in zip(nodes, texts, results):
+            rows.extend(_grammar_rows(ref, text, matches))
+        stage.count = len(rows)
+    with _timed(timings, "dedupe") as stage:
+        rows = dedupe_rows(rows)
+        stage.count = len(rows)
+    return rows
 
-        for m in matches:
-            if not m.replacements:
-                continue
-            before = text[m.offset:m.offset + m.errorLength]
-            after = m.replacements[0]
-            if before.strip() == after.strip() or not before.strip():
-                continue
-            suggestions.append({
-                "type": "Grammar",
-                "rule_id": m.ruleId,
-                "description": m.message,
-                "path": ref.path,
-                "before": before,
-                "after": after,
-                "apply": False
-            })
-    return dedupe_suggestions(suggestions)
+
+def apply_langtool_to_nodes(nodes: List[TextNodeRef]) -> List[Dict[str, Any]]:
+    """
+    langtool_rows as a list of suggestion dictionaries.
+    """
+    return _as_dicts(langtool_rows(nodes))
+
+
+def _grammar_rows(ref: TextNodeRef, text: str, matches) -> List[Tuple]:
+    """
+    Turn the LanguageTool matches for one text node into suggestion rows.
+    Rule ids and messages repeat across many rows, so they are interned.
+    """
+    rows = []
+    for m in matches:
+        if not m.replacements:
+            continue
+        before = text[m.offset:m.offset + m.errorLength]
+        after = m.replacements[0]
+        if before.strip() == after.strip() or not before.strip():
+            continue
+        rows.append(("Grammar", sys.intern(m.ruleId), sys.intern(m.message), ref.path,
+                     ref.node_id, m.offset, m.offset + m.errorLength, before, after))
+    return rows
 
 
 def dedupe_suggestions(suggs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     """
     Remove duplicate suggestions to keep the list clean.
+    Suggestions for different nodes or different places in a node are kept
+    even if their text matches.
+    """
+    # Dedupe the rows (keyed as in dedupe_rows), carrying each dict's index
+    rows = dedupe_rows([tuple(s[c] for c in SUGGESTION_COLUMNS) + (i,) for i, s in enumerate(suggs)])
+    return [suggs[row[-1]] for row in rows]
+
+
+def dedupe_rows(rows: List[Tuple]) -> List[Tuple]:
+    """
+    Remove duplicate suggestion rows (see dedupe_suggestions): rows with
+    the same type, rule, node, start, before and after text are dropped.
     """
     seen = set()
     out = []
-    for s in suggs:
-        key = (s["type"], s["rule_id"], s["path"], s["before"], s["after"])
+    for row in rows:
+        key = (row[0], row[1], row[4], row[5], row[7], row[8])
         if key in seen:
             continue
         seen.add(key)
-        out.append(s)
+        out.append(row)
     return out
 
 
+def _as_dicts(rows: List[Tuple]) -> List[Dict[str, Any]]:
+    return [dict(zip(SUGGESTION_COLUMNS, row), apply=False) for row in rows]
+
+
 # -------------------------------
 # APPLY CHANGES TO HTML
 # -------------------------------
-def apply_selected_changes(soup: BeautifulSoup, df) -> Tuple[str, int]:
+def _select_span_edits(text: str, edits: List[Tuple[int, int, str, str]]):
     """
-    Apply the changes that the user has selected in the GUI to the HTML.
-    Returns the updated HTML as a string and the number of changes applied.
+    The edits that apply_span_edits would apply, in order of position.
+    Narrower edits are picked first, so a review hit covering a whole
+    sentence never wins over the precise fixes inside it.
+    Returns (edits to apply, number skipped).
     """
-    changes = df[df.get("apply", False) == True].to_dict("records")
-    applied = 0
+    spans: List[Tuple[int, int]] = []  # chosen spans, sorted and disjoint
+    chosen = []
+    for start, end, before, after in sorted(edits, key=lambda e: (e[1] - e[0], e[0])):
+        if text[start:end] != before:
+            continue
+        i = bisect.bisect_left(spans, (start, end))
+        if (i and spans[i - 1][1] > start) or (i < len(spans) and spans[i][0] < end):
+            continue
+        spans.insert(i, (start, end))
+        chosen.append((start, end, before, after))
+    chosen.sort(key=lambda e: (e[0], e[1]))
+    return chosen, len(edits) - len(chosen)
 
-    # Group changes by path for easy replacement
-    by_path = {}
-    for c in changes:
-        by_path.setdefault(c["path"], []).append((c["before"], c["after"]))
 
-    for text in soup.find_all(string=True):
-        if not isinstance(text, NavigableString):
+def apply_span_edits(text: str, edits: List[Tuple[int, int, str, str]]) -> Tuple[str, int, int]:
+    """
+    Apply (start, end, before, after) edits to one text in a single pass.
+    An edit is skipped if it overlaps a narrower edit (or, for the same
+    width, one that starts earlier), or if the text at start:end is no
+    longer `before`.
+    Returns (new_text, applied, skipped).
+    """
+    chosen, skipped = _select_span_edits(text, edits)
+    parts = []
+    pos = 0
+    for start, end, before, after in chosen:
+        parts.append(text[pos:start])
+        parts.append(after)
+        pos = end
+    parts.append(text[pos:])
+    return "".join(parts), len(chosen), skipped
+
+
+# -------------------------------
+# SOURCE OFFSETS
+# -------------------------------
+# Markup and text in the original HTML, in order. Script and style bodies
+# count as markup: they are never checked.
+_SOURCE_TOKEN_RE = re.compile(
+    r"(?P<comment><!--)(?P<comment_body>.*?)-->"
+    r"|<!\[CDATA\[(?P<cdata>.*?)\]\]>"
+    r"|<(?P<raw>script|style)\b(?:\"[^\"]*\"|'[^']*'|[^'\">])*>.*?</(?P=raw)\s*>"
+    r"|<[!?][^>]*>"
+    r"|</?[A-Za-z](?:\"[^\"]*\"|'[^']*'|[^'\">])*>"
+    r"|(?P<text>(?:[^<]|<(?![A-Za-z/!?]))+)",
+    re.DOTALL | re.IGNORECASE,
+)
+
+# Character and entity references, as html.unescape finds them
+_CHARREF_RE = re.compile(r"&(#[0-9]+;?|#[xX][0-9a-fA-F]+;?|[^\t\n\f <&#;]{1,32};?)|\r\n?")
+
+
+def _source_strings(source: str) -> Iterator[Tuple[str, int, int, str]]:
+    """
+    Yield (kind, start, end, text) for the text, comments and CDATA of the
+    source: start:end is the raw range, text what a parser reads from it.
+    """
+    for m in _SOURCE_TOKEN_RE.finditer(source):
+        if m.group("text") is not None:
+            yield "text", m.start(), m.end(), html.unescape(m.group("text"))
+        elif m.group("comment") is not None:
+            yield "comment", m.start("comment_body"), m.end("comment_body"), m.group("comment_body")
+        elif m.group("cdata") is not None:
+            yield "cdata", m.start("cdata"), m.end("cdata"), m.group("cdata")
+
+
+def _same_text(node_text: str, source_text: str) -> bool:
+    # XML and lxml turn \r\n and \r into \n; html.parser keeps them
+    return node_text == source_text or (
+        "\r" in source_text
+        and node_text == source_text.replace("\r\n", "\n").replace("\r", "\n")
+    )
+
+
+def locate_text_nodes(source: str, nodes: List[TextNodeRef]) -> bool:
+    """
+    Find where each text node (from extract_text_nodes) is in the original
+    source and store it in node.source_span (raw start, end, kind).
+    The source is split into text, comments and CDATA without a full parse;
+    its checkable strings must match the nodes one to one. If the parser
+    moved or merged any text, nothing is located and False is returned.
+    """
+    located = []
+    for kind, start, end, text in _source_strings(source):
+        if not text or text.isspace() or len(text.strip()) < 2:
             continue
-        path = _node_path(text)
-        if path not in by_path:
+        located.append((kind, start, end, text))
+    # The doctype and processing instructions are markup in the source
+    # (lxml's HTML parser reads "<?xml ...?>" as a comment "?xml ...?")
+    checked = [ref for ref in nodes
+               if not isinstance(ref.node, (Doctype, Declaration, ProcessingInstruction))
+               and not (isinstance(ref.node, Comment) and ref.node.startswith("?"))]
+    if len(checked) != len(located):
+        return False
+    for ref, (kind, start, end, text) in zip(checked, located):
+        if not _same_text(str(ref.node), text):
+            return False
+    for ref, (kind, start, end, text) in zip(checked, located):
+        ref.source_span = (start, end, kind)
+    return True
+
+
+def _raw_offsets(raw: str, text: str) -> Optional[Dict[int, int]]:
+    """
+    Map offsets in a node's text to offsets in its raw source, at every
+    character that is not inside a character reference (&nbsp;, &#160;...).
+    Returns None if the raw source does not decode to text.
+    """
+    mapping = {}
+    pos = dec = 0
+    for m in _CHARREF_RE.finditer(raw):
+        for i in range(pos, m.start()):
+            mapping[dec] = i
+            dec += 1
+        mapping[dec] = m.start()
+        piece = m.group()
+        decoded = html.unescape(piece) if piece[0] == "&" else piece
+        if piece[0] == "\r" and not text.startswith(piece, dec):
+            decoded = "\n"
+        dec += len(decoded)
+        pos = m.end()
+    for i in range(pos, len(raw)):
+        mapping[dec] = i
+        dec += 1
+    mapping[dec] = len(raw)
+    return mapping if dec == len(text) else None
+
+
+def _escape_for(kind: str, text: str) -> str:
+    # Text needs &, < and > escaped, like BeautifulSoup writes it
+    return html.escape(text, quote=False) if kind == "text" else text
+
+
+def source_changes(source: str, nodes: List[TextNodeRef],
+                   edits_by_node: Dict[int, List[Tuple[int, int, str, str]]]
+                   ) -> Optional[List[Tuple[int, int, str]]]:
+    """
+    Turn already selected edits (see _select_span_edits) into changes to the
+    original source: (start, end, new raw text), sorted by position.
+    Nodes need source_span set by locate_text_nodes.
+    Returns None if an edit cannot be placed in the source.
+    """
+    changes = []
+    for node_id, edits in edits_by_node.items():
+        ref = nodes[node_id]
+        if ref.source_span is None:
+            return None
+        start, end, kind = ref.source_span
+        raw, text = source[start:end], str(ref.node)
+        offsets = None
+        if raw != text:
+            offsets = _raw_offsets(raw, text)
+            if offsets is None:
+                return None
+        for e_start, e_end, before, after in edits:
+            if offsets is not None:
+                if e_start not in offsets or e_end not in offsets:
+                    return None
+                e_start, e_end = offsets[e_start], offsets[e_end]
+            changes.append((start + e_start, start + e_end, _escape_for(kind, after)))
+    changes.sort()
+    return changes
+
+
+def apply_source_changes(source: str, changes: List[Tuple[int, int, str]]) -> str:
+    """
+    Replace only the changed ranges of the source, so everything else
+    (attributes, whitespace, entities, line endings) stays byte for byte
+    as it was.
+    """
+    parts = []
+    pos = 0
+    for start, end, new in changes:
+        parts.append(source[pos:start])
+        parts.append(new)
+        pos = end
+    parts.append(source[pos:])
+    return "".join(parts)
+
+
+def _accepted_edits(df) -> Tuple[Dict[int, List[Tuple[int, int, str, str]]], int]:
+    """
+    Collect the accepted changes of the GUI table as edits grouped by node_id.
+    Returns (edits by node, number of rows without node_id/start/end,
+    e.g. rows added by hand, which cannot be placed).
+    """
+    changes = df[df.get("apply", False) == True].to_dict("records")
+    by_node: Dict[int, List[Tuple[int, int, str, str]]] = {}
+    unplaced = 0
+    for c in changes:
+        values = (c.get("node_id"), c.get("start"), c.get("end"))
+        if any(v is None or v != v for v in values):  # missing or NaN
+            unplaced += 1
             continue
+        node_id, start, end = (int(v) for v in values)
+        by_node.setdefault(node_id, []).append((start, end, c["before"], c["after"]))
+    return by_node, unplaced
+
+
+def apply_selected_changes(soup: BeautifulSoup, df,
+                           nodes: Optional[List[TextNodeRef]] = None,
+                           source: Optional[str] = None,
+                           changes: Optional[list] = None) -> Tuple[str, int, int]:
+    """
+    Apply the changes that the user has selected in the GUI to the HTML.
+    Each change is applied to the node given by its node_id, at its
+    start/end offsets. `nodes` are the text nodes of `soup` from
+    extract_text_nodes; they are extracted again if not given (the same
+    HTML always gives the same node ids).
+    If `source` (the HTML that soup was parsed from) is given, the changes
+    are spliced into it and the rest of the file is kept exactly as it was;
+    otherwise, or if a change cannot be placed in the source, the whole
+    soup is written out again. When the changes are spliced and `changes`
+    is a list, the (start, end, new text) source changes are added to it,
+    for render_diff_html.
+    Returns the updated HTML as a string, the number of changes applied and
+    the number skipped because they overlapped another change, no longer
+    matched the text or had no position (rows added by hand).
+    """
+    applied = 0
+    if nodes is None:
+        nodes = extract_text_nodes(soup)
 
+    by_node, skipped = _accepted_edits(df)
+    selected = {}
+    for node_id, edits in by_node.items():
+        if not 0 <= node_id < len(nodes):
+            skipped += len(edits)
+            continue
+        text = nodes[node_id].node
         original = str(text)
-        new_text = original
-        for before, after in by_path[path]:
-            new_text = new_text.replace(before, after, 1)
+        chosen, not_done = _select_span_edits(original, edits)
+        new_text, done, _ = apply_span_edits(original, chosen)
+        applied += done
+        skipped += not_done
+        if chosen:
+            selected[node_id] = chosen
         if new_text != original:
-            text.replace_with(new_text)
-            applied += 1
+            # Keep the string type, so a changed comment stays a comment
+            text.replace_with(type(text)(new_text))
 
-    return str(soup), applied
+    if source is not None:
+        if not selected:
+            return source, applied, skipped
+        if locate_text_nodes(source, nodes):
+            spliced = source_changes(source, nodes, selected)
+            if spliced is not None:
+                if changes is not None:
+                    changes.extend(spliced)
+                return apply_source_changes(source, spliced), applied, skipped
+    return str(soup), applied, skipped
 
 
 # -------------------------------
 # RENDER DIFF
 # -------------------------------
-def render_diff_html(before_html: str, after_html: str) -> str:
+_DIFF_PRE = ("<pre style='font-family: ui-monospace, Menlo, Consolas, monospace; "
+             "font-size:12px; white-space: pre-wrap'>")
+_DIFF_STYLES = {
+    "-": "background:#ffecec",
+    "+": "background:#eaffea",
+    "del": "background:#ffb6ba",
+    "ins": "background:#97f295; text-decoration:none",
+    "skip": "color:#888",
+}
+
+
+def _word_segments(before: str, after: str):
+    """
+    Word-level diff of one change: (old segments, new segments), each a list
+    of (text, changed) pairs. Only the changed text is compared, so the cost
+    depends on the size of the change, not of the document.
+    """
+    a = re.findall(r"\w+|\s+|[^\w\s]", before)
+    b = re.findall(r"\w+|\s+|[^\w\s]", after)
+    old, new = [], []
+    for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, a, b, autojunk=False).get_opcodes():
+        same = tag == "equal"
+        if i2 > i1:
+            old.append(("".join(a[i1:i2]), not same))
+        if j2 > j1:
+            new.append(("".join(b[j1:j2]), not same))
+    return old, new
+
+
+def _marked_lines(segments, mark: str) -> List[str]:
+    """
+    Escape (text, changed) segments and split them into lines, wrapping
+    changed text in <del> or <ins> (closed and reopened at line breaks).
+    """
+    lines = [""]
+    for text, changed in segments:
+        for i, part in enumerate(text.split("\n")):
+            if i:
+                lines.append("")
+            if part and changed:
+                lines[-1] += f"<{mark} style='{_DIFF_STYLES[mark]}'>{html.escape(part)}</{mark}>"
+            else:
+                lines[-1] += html.escape(part)
+    return lines
+
+
+def _line_bounds(text: str, start: int, end: int, context: int) -> Tuple[int, int]:
+    """
+    Start of the line holding `start` and end of the line holding `end`,
+    widened by `context` lines on each side.
+    """
+    lo = text.rfind("\n", 0, start) + 1
+    for _ in range(context):
+        if lo == 0:
+            break
+        lo = text.rfind("\n", 0, lo - 1) + 1
+    hi = text.find("\n", end)
+    hi = len(text) if hi < 0 else hi
+    for _ in range(context):
+        if hi == len(text):
+            break
+        nxt = text.find("\n", hi + 1)
+        hi = len(text) if nxt < 0 else nxt
+    return lo, hi
+
+
+def _render_change_diff(source: str, changes: List[Tuple[int, int, str]], context: int) -> str:
+    """
+    render_diff_html for known changes to the source: only the lines around
+    each change are shown, with the changed words highlighted; unchanged
+    regions in between are collapsed. No whole-document diff is computed.
+    """
+    # Group changes into hunks of lines, merging hunks that touch
+    hunks = []
+    for start, end, new in sorted(changes):
+        lo, hi = _line_bounds(source, start, end, context)
+        if hunks and lo <= hunks[-1][1] + 1:
+            hunks[-1][1] = max(hunks[-1][1], hi)
+            hunks[-1][2].append((start, end, new))
+        else:
+            hunks.append([lo, hi, [(start, end, new)]])
+
+    def collapsed(count):
+        return f"<span style='{_DIFF_STYLES['skip']}'>⋯ {count} unchanged lines</span>"
+
+    out = [_DIFF_PRE]
+    line_no, pos = 1, 0  # line number and offset where the next unshown text starts
+    for lo, hi, hunk_changes in hunks:
+        skipped = source.count("\n", pos, lo)
+        if skipped:
+            out.append(collapsed(skipped))
+        line_no += skipped
+        out.append(f"<span style='{_DIFF_STYLES['skip']}'>@@ line {line_no} @@</span>")
+        out.extend(_render_hunk(source, lo, hi, hunk_changes))
+        line_no += source.count("\n", lo, hi) + 1
+        pos = hi + 1
+    if pos < len(source):
+        out.append(collapsed(source.count("\n", pos) + (not source.endswith("\n"))))
+    if not hunks:
+        out.append(f"<span style='{_DIFF_STYLES['skip']}'>No changes</span>")
+    out.append("</pre>")
+    return "\n".join(out)
+
+
+def _render_hunk(source: str, lo: int, hi: int, changes: List[Tuple[int, int, str]]) -> List[str]:
+    """
+    The lines of source[lo:hi]: unchanged lines as they are, each run of
+    changed lines as its old lines (-) followed by its new lines (+).
+    """
+    # Runs of changed lines: [run start, run end, changes], merging runs that share a line
+    runs = []
+    for start, end, new in changes:
+        r_lo = source.rfind("\n", 0, start) + 1
+        r_hi = source.find("\n", end)
+        r_hi = hi if r_hi < 0 or r_hi > hi else r_hi
+        if runs and r_lo <= runs[-1][1]:
+            runs[-1][1] = max(runs[-1][1], r_hi)
+            runs[-1][2].append((start, end, new))
+        else:
+            runs.append([r_lo, r_hi, [(start, end, new)]])
+
+    lines = []
+    pos = lo
+    for r_lo, r_hi, run_changes in runs:
+        if r_lo > pos:
+            lines.extend("  " + html.escape(line) for line in source[pos:r_lo - 1].split("\n"))
+        old, new = [], []
+        at = r_lo
+        for start, end, replacement in run_changes:
+            old.append((source[at:start], False))
+            new.append((source[at:start], False))
+            old_words, new_words = _word_segments(source[start:end], replacement)
+            old.extend(old_words)
+            new.extend(new_words)
+            at = end
+        old.append((source[at:r_hi], False))
+        new.append((source[at:r_hi], False))
+        lines.extend(f"<span style='{_DIFF_STYLES['-']}'>- {line}</span>"
+                     for line in _marked_lines(old, "del"))
+        lines.extend(f"<span style='{_DIFF_STYLES['+']}'>+ {line}</span>"
+                     for line in _marked_lines(new, "ins"))
+        pos = r_hi + 1
+    if pos <= hi:
+        lines.extend("  " + html.escape(line) for line in source[pos:hi].split("\n"))
+    return lines
+
+
+def render_diff_html(before_html: str, after_html: str,
+                     changes: Optional[List[Tuple[int, int, str]]] = None,
+                     context: int = 2) -> str:
     """
     Create a colored diff in HTML to show changes between original and cleaned HTML.
+    If the changes made to before_html are known (see apply_selected_changes),
+    only the lines around them are shown, with `context` unchanged lines on
+    each side and the changed words highlighted; the cost then depends on
+    the number of changes, not the size of the topic. Otherwise a line diff
+    of the two documents is shown.
     """
+    if changes is not None:
+        return _render_change_diff(before_html, changes, context)
+
     before_lines = before_html.splitlines(keepends=False)
     after_lines = after_html.splitlines(keepends=False)
     diff = difflib.unified_diff(
         before_lines, after_lines,
         fromfile="original.html", tofile="cleaned.html", lineterm=""
     )
-    html = ["<pre style='font-family: ui-monospace, Menlo, Consolas, monospace; font-size:12px; white-space: pre-wrap'>"]
+    out = [_DIFF_PRE]
     for line in diff:
-        if line.startswith("+") and not line.startswith("+++") :
-            html.append(f"<span style='background:#eaffea'>{line}</span>")
+        if line.startswith("+") and not line.startswith("+++"):
+            out.append(f"<span style='{_DIFF_STYLES['+']}'>{html.escape(line)}</span>")
         elif line.startswith("-") and not line.startswith("---"):
-            html.append(f"<span style='background:#ffecec'>{line}</span>")
+            out.append(f"<span style='{_DIFF_STYLES['-']}'>{html.escape(line)}</span>")
         else:
-            html.append(line)
-    html.append("</pre>")
-    return "\n".join(html)
+            out.append(html.escape(line))
+    out.append("</pre>")
+    return "\n".join(out)
 
 
 # -------------------------------
 # MAIN PROCESS FUNCTION
 # -------------------------------
-def process_html(soup: BeautifulSoup):
+def suggestions_frame(rows: List[Tuple], columns: Tuple[str, ...] = SUGGESTION_COLUMNS):
+    """
+    Build the DataFrame of suggestions shown in the GUI from rows.
+    The frame is built column by column, and the columns with few distinct
+    values (see CATEGORY_COLUMNS) are stored as categoricals, which keeps
+    project-wide reports with many rows small.
+    Every suggestion starts out accepted ("apply" is True).
+    """
+    import pandas as pd
+
+    data = {}
+    for i, name in enumerate(columns):
+        # One column at a time, so only one extra list is alive at once
+        column = [row[i] for row in rows]
+        if name in CATEGORY_COLUMNS:
+            data[name] = pd.Categorical(column)
+        elif name in ("node_id", "start", "end"):
+            data[name] = pd.array(column, dtype="int64")
+        elif name == "apply":
+            data[name] = pd.array(column, dtype=bool)
+        else:
+            data[name] = pd.Series(column, dtype=None if column else object)
+    df = pd.DataFrame(data, columns=list(columns))
+    if "apply" not in df.columns:
+        df["apply"] = True
+    return df
+
+
+def _text_nodes(soup, timings: Optional[StageTimings] = None) -> List[TextNodeRef]:
+    """
+    Text nodes of a parsed topic, or of its HTML source for report-only
+    checks (read straight from lxml, see extract_report_nodes).
+    """
+    if isinstance(soup, str):
+        return extract_report_nodes(soup, timings=timings)
+    with _timed(timings, "extract_text_nodes") as stage:
+        nodes = extract_text_nodes(soup)
+        stage.count = len(nodes)
+    return nodes
+
+
+def _timed_frame(rows: List[Tuple], timings: Optional[StageTimings]):
+    with _timed(timings, "dataframe") as stage:
+        df = suggestions_frame(rows)
+        stage.count = len(df)
+    return df
+
+
+def process_html(soup, include_grammar: bool = True, timings: Optional[StageTimings] = None):
     """
     Process the BeautifulSoup object:
     - Extract all text nodes
     - Apply MSTP rules
-    - Apply LanguageTool grammar checks
+    - Apply LanguageTool grammar checks (unless include_grammar is False)
+    For report-only checks, pass the HTML source (str) instead of a soup:
+    the text nodes are then read without building a BeautifulSoup tree.
+    The suggestions are the same either way.
+    Pass a StageTimings to record where the time goes (parsing is only
+    included when the source is passed in).
     Returns a pandas DataFrame of suggested changes.
     """
-    import pandas as pd
-
-    nodes = extract_text_nodes(soup)
-    suggestions = apply_mstp_rules_to_nodes(nodes)
+    nodes = _text_nodes(soup, timings)
+    rows = mstp_rows(nodes, timings)
 
     # Apply LanguageTool
-    grammar_suggestions = apply_langtool_to_nodes(nodes)
-    all_suggestions = suggestions + grammar_suggestions
+    if include_grammar:
+        rows += langtool_rows(nodes, timings)
 
-    df = pd.DataFrame(all_suggestions)
-    if not df.empty:
-        df["apply"] = True
+    return _timed_frame(rows, timings)
 
-    return df
+
+# Grammar checks started by process_html_streaming run here
+_grammar_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="grammar-check")
+
+
+def process_html_streaming(soup, timings: Optional[StageTimings] = None) -> Tuple[Any, Future]:
+    """
+    Like process_html, but returns straight after the MSTP checks.
+    Returns (mstp_df, future): mstp_df holds the MSTP suggestions, and
+    future resolves to the full DataFrame (MSTP + grammar) once the
+    LanguageTool checks have finished in the background.
+    timings, if given, gets the grammar stages when the future is done.
+    """
+    nodes = _text_nodes(soup, timings)
+    rows = mstp_rows(nodes, timings)
+
+    def with_grammar():
+        return _timed_frame(rows + langtool_rows(nodes, timings), timings)
+
+    return _timed_frame(rows, timings), _grammar_executor.submit(with_grammar)
+
+
+# -------------------------------
+# STREAMING FINDINGS
+# -------------------------------
+def _node_windows(nodes: List[TextNodeRef], max_chars: int) -> Iterator[List[TextNodeRef]]:
+    """
+    Split nodes, in order, into runs of about max_chars characters of text.
+    """
+    window, size = [], 0
+    for ref in nodes:
+        window.append(ref)
+        size += len(ref.node)
+        if size >= max_chars:
+            yield window
+            window, size = [], 0
+    if window:
+        yield window
+
+
+def iter_findings(soup, include_grammar: bool = True) -> Iterator[Dict[str, Any]]:
+    """
+    Like process_html, but yields suggestions one node at a time (MSTP,
+    then grammar), in node order, instead of building a DataFrame.
+    Grammar checks run over windows of nodes large enough to fill the
+    configured batches, so the first findings arrive quickly and memory
+    stays bounded however large the input is.
+    """
+    nodes = _text_nodes(soup)
+    _current_engine()
+    lt = get_grammar_backend() if include_grammar else None
+    cache = get_grammar_cache() if lt is not None else None
+    config = get_grammar_config()
+    window_chars = config.batch_chars * max(1, config.concurrency)
+
+    for window in _node_windows(nodes, window_chars):
+        texts = [str(ref.node) for ref in window]
+        if lt is not None:
+            results = check_texts(lt, texts, cache=cache)
+        else:
+            results = [[] for _ in window]
+        for ref, text, matches in zip(window, texts, results):
+            found = _mstp_rows(ref) + _grammar_rows(ref, text, matches)
+            # Duplicates are always within one node, so dedupe per node
+            yield from _as_dicts(dedupe_rows(found))
@@ -0,0 +1,309 @@
+# rule_engine.py
+# -------------------------------
+# This file compiles the MSTP rules into a single scanner.
+# Instead of running every rule's regex over every text node, one combined
+# "trigger" regex finds the literal words each rule needs (for example
+# 'click on', 'e-mail', '&'). Only the rules whose trigger words appear in
+# the text are then run, so most text nodes are scanned once.
+# -------------------------------
+
+import hashlib
+import json
+import re
+import time
+from typing import Any, Dict, FrozenSet, Iterable, Iterator, List, Optional, Tuple
+
+try:
+    from re import _parser as _sre_parse  # Python 3.11+
+except ImportError:  # pragma: no cover - older Pythons
+    import sre_parse as _sre_parse
+
+
+Span = Tuple[int, int]
+
+
+# -------------------------------
+# LITERAL EXTRACTION
+# -------------------------------
+def _best(candidates: List[FrozenSet[str]]) -> Optional[FrozenSet[str]]:
+    """
+    Pick the most selective set of literals: the longest shortest literal,
+    then the fewest alternatives.
+    """
+    candidates = [c for c in candidates if c and all(c)]
+    if not candidates:
+        return None
+    return max(candidates, key=lambda c: (min(len(x) for x in c), -len(c)))
+
+
+def _required_literals(seq) -> Optional[FrozenSet[str]]:
+    """
+    Return a set of literal strings such that every match of the parsed
+    pattern `seq` contains at least one of them, or None if no such set
+    can be found (the rule then always runs).
+    """
+    candidates: List[FrozenSet[str]] = []
+    run: List[str] = []
+
+    def end_run():
+        if run:
+            candidates.append(frozenset(["".join(run)]))
+            run.clear()
+
+    for op, arg in seq:
+        name = str(op)
+        if name == "LITERAL":
+            run.append(chr(arg))
+            continue
+        end_run()
+        if name == "SUBPATTERN":
+            candidates.append(_required_literals(arg[-1]))
+        elif name == "BRANCH":
+            alts = [_required_literals(alt) for alt in arg[1]]
+            if all(alts):
+                candidates.append(frozenset().union(*alts))
+        elif name == "IN":
+            if arg and all(str(o) == "LITERAL" for o, _ in arg):
+                candidates.append(frozenset(chr(a) for _, a in arg))
+        elif name in ("MAX_REPEAT", "MIN_REPEAT", "POSSESSIVE_REPEAT"):
+            if arg[0] >= 1:
+                candidates.append(_required_literals(arg[2]))
+        elif name == "ATOMIC_GROUP":
+            candidates.append(_required_literals(arg))
+    end_run()
+    return _best([c for c in candidates if c])
+
+
+def _analyze(pattern: re.Pattern) -> Tuple[Optional[FrozenSet[str]], int]:
+    """
+    Return (required literals, minimum match width) for a compiled pattern.
+    """
+    try:
+        parsed = _sre_parse.parse(pattern.pattern, pattern.flags)
+    except Exception:
+        return None, 0
+    min_width = parsed.getwidth()[0]
+    return _required_literals(parsed), min_width
+
+
+def _case_fold_table(chars: str) -> Dict[int, str]:
+    """
+    Build a str.translate table mapping every character that IGNORECASE
+    treats as equal to one of `chars` onto a single representative.
+    Unlike str.casefold, it keeps lengths and agrees with the regex engine
+    on characters such as 'İ', 'ſ' and the Kelvin sign.
+    """
+    chars = "".join(sorted(set(chars)))
+    if not chars:
+        return {}
+    same = re.compile("[%s]" % re.escape(chars), re.IGNORECASE).fullmatch
+    top = 0x110000 if max(chars) > "\uffff" else 0x10000
+    table = {}
+    for code in range(top):
+        c = chr(code)
+        if same(c):
+            rep = next(l for l in chars if re.fullmatch(re.escape(l), c, re.IGNORECASE))
+            if rep != c:
+                table[code] = rep
+    return table
+
+
+# -------------------------------
+# COMPILED RULE ENGINE
+# -------------------------------
+def rules_fingerprint(rules: List[Dict[str, Any]]) -> str:
+    """
+    Return a short hash of a rule list: ids, descriptions, patterns, flags
+    and replacements (including the code of replacement functions).
+    It changes whenever a rule is added, removed or edited.
+    """
+    h = hashlib.sha256()
+    for rule in rules:
+        repl = rule.get("repl")
+        code = getattr(repl, "__code__", None)
+        if code is not None:
+            repl = (code.co_code, code.co_consts, code.co_names)
+        h.update(repr((
+            rule["id"], rule.get("desc"), rule["pattern"].pattern,
+            rule["pattern"].flags, repl,
+        )).encode("utf-8"))
+    return h.hexdigest()[:16]
+
+
+class RuleEngine:
+    """
+    A set of rules merged into one scanner.
+    - scan(text) yields (rule_id, (start, end)) for every rule match,
+      in the same order as running each rule's finditer in turn.
+    - fingerprint identifies the rule set (see rules_fingerprint).
+    """
+
+    def __init__(self, rules: List[Dict[str, Any]]):
+        self.rules = list(rules)
+        self.fingerprint = rules_fingerprint(self.rules)
+        self.by_id = {rule["id"]: rule for rule in self.rules}
+        self._min_width = []
+        self._always = []  # rules with no usable literal: always run
+        literal_rules: Dict[str, set] = {}
+
+        for i, rule in enumerate(self.rules):
+            literals, min_width = _analyze(rule["pattern"])
+            self._min_width.append(min_width)
+            if literals is None:
+                self._always.append(i)
+                continue
+            for lit in literals:
+                literal_rules.setdefault(lit, set()).add(i)
+
+        # Literals and text are folded with the regex engine's own
+        # IGNORECASE rules (see _case_fold_table), so the trigger keeps its
+        # fast case-sensitive literal search without missing any match.
+        self._fold = _case_fold_table("".join(literal_rules))
+        folded: Dict[str, set] = {}
+        for lit, owners in literal_rules.items():
+            folded.setdefault(lit.translate(self._fold), set()).update(owners)
+
+        # A literal found at some position also means every shorter literal
+        # that is a prefix of it is there, so fold those rules in as well.
+        keys = sorted(folded, key=len, reverse=True)
+        self._literal_rules: Dict[str, FrozenSet[int]] = {}
+        for key in keys:
+            owners = set(folded[key])
+            for other in keys:
+                if len(other) < len(key) and key.startswith(other):
+                    owners |= folded[other]
+            self._literal_rules[key] = frozenset(owners)
+
+        self._trigger = (
+            re.compile("|".join(re.escape(k) for k in keys)) if keys else None
+        )
+
+    def candidates(self, text: str) -> List[int]:
+        """
+        Return the indexes (in rule order) of the rules that may match `text`.
+        """
+        found = set(self._always)
+        if self._trigger is not None:
+            everything = len(self.rules)
+            folded = text.translate(self._fold)
+            search = self._trigger.search
+            m = search(folded)
+            while m is not None and len(found) < everything:
+                found |= self._literal_rules[m.group(0)]
+                m = search(folded, m.start() + 1)
+        n = len(text)
+        return [i for i in sorted(found) if n >= self._min_width[i]]
+
+    def scan(self, text: str, profiler: Optional["RuleProfiler"] = None) -> Iterator[Tuple[str, Span]]:
+        """
+        Yield (rule_id, span) for every rule match in `text`.
+        With a profiler, the cost of each rule is recorded in it.
+        """
+        if profiler is not None:
+            yield from self._scan_profiled(text, profiler)
+            return
+        for i in self.candidates(text):
+            rule = self.rules[i]
+            for m in rule["pattern"].finditer(text):
+                yield rule["id"], m.span()
+
+    def _scan_profiled(self, text: str, profiler: "RuleProfiler") -> Iterator[Tuple[str, Span]]:
+        start = time.perf_counter()
+        candidates = self.candidates(text)
+        profiler.record_trigger(time.perf_counter() - start, len(text))
+        for i in candidates:
+            rule = self.rules[i]
+            start = time.perf_counter()
+            spans = [m.span() for m in rule["pattern"].finditer(text)]
+            profiler.record(rule["id"], time.perf_counter() - start, len(spans), len(text))
+            for span in spans:
+                yield rule["id"], span
+
+
+# -------------------------------
+# PROFILING
+# -------------------------------
+class RuleProfiler:
+    """
+    Cost of each rule, summed over every scan it is passed to:
+    - seconds: time spent in the rule's regex
+    - calls: texts the rule ran on (the trigger regex skips the others)
+    - matches: matches found
+    - chars: characters scanned (len of the texts, not encoded bytes)
+    The trigger regex that picks the rules is counted as "(trigger)".
+    """
+
+    TRIGGER = "(trigger)"
+
+    def __init__(self):
+        self.texts = 0
+        self.stats: Dict[str, Dict[str, Any]] = {}
+
+    def _entry(self, rule_id: str) -> Dict[str, Any]:
+        entry = self.stats.get(rule_id)
+        if entry is None:
+            entry = self.stats[rule_id] = {"seconds": 0.0, "calls": 0, "matches": 0, "chars": 0}
+        return entry
+
+    def add_rules(self, rule_ids: Iterable[str]):
+        """List these rules even if they never run."""
+        for rule_id in rule_ids:
+            self._entry(rule_id)
+
+    def record(self, rule_id: str, seconds: float, matches: int, chars: int):
+        entry = self._entry(rule_id)
+        entry["seconds"] += seconds
+        entry["calls"] += 1
+        entry["matches"] += matches
+        entry["chars"] += chars
+
+    def record_trigger(self, seconds: float, chars: int):
+        self.texts += 1
+        self.record(self.TRIGGER, seconds, 0, chars)
+
+    def merge(self, other: "RuleProfiler"):
+        """Add another profiler's numbers to this one (e.g. from another process)."""
+        self.texts += other.texts
+        for rule_id, entry in other.stats.items():
+            mine = self._entry(rule_id)
+            for key, value in entry.items():
+                mine[key] += value
+
+    def rows(self) -> List[Dict[str, Any]]:
+        """One row per rule, most expensive first."""
+        rows = [
+            {"rule_id": rule_id, **entry,
+             "us_per_call": entry["seconds"] / entry["calls"] * 1e6 if entry["calls"] else 0.0}
+            for rule_id, entry in self.stats.items()
+        ]
+        rows.sort(key=lambda row: (-row["seconds"], row["rule_id"]))
+        return rows
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"texts": self.texts, "rules": self.rows()}
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), indent=2)
+
+    def format_table(self) -> str:
+        rows = self.rows()
+        total = sum(row["seconds"] for row in rows) or 1.0
+        width = max([len("rule"), *(len(row["rule_id"]) for row in rows)])
+        lines = [
+            f"{self.texts} texts scanned",
+            f"{'rule':<{width}}  {'ms':>9}  {'share':>6}  {'calls':>8}  {'matches':>8}  "
+            f"{'chars':>11}  {'us/call':>8}",
+        ]
+        for row in rows:
+            lines.append(
+                f"{row['rule_id']:<{width}}  {row['seconds'] * 1000:9.2f}  {row['seconds'] / total:6.1%}  "
+                f"{row['calls']:8d}  {row['matches']:8d}  {row['chars']:11d}  {row['us_per_call']:8.1f}"
+            )
+        return "\n".join(lines)
+
+
+def compile_rules(rules: List[Dict[str, Any]]) -> RuleEngine:
+    """
+    Build a RuleEngine for a list of rule dictionaries (see mstp_rules.py).
+    """
+    return RuleEngine(rules)
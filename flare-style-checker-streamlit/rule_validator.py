@@ -0,0 +1,373 @@
+# rule_validator.py
+# -------------------------------
+# Checks the MSTP rule patterns for catastrophic backtracking (ReDoS).
+# Python's regex engine backtracks, so some patterns take quadratic (or
+# exponential) time on long text they do not match, e.g. a huge
+# single-paragraph table cell with no full stop. Two checks:
+# 1. Static analysis of each parsed pattern for shapes known to backtrack
+#    super-linearly (nested repeats, overlapping adjacent repeats, an
+#    unanchored leading repeat). These are warnings: not every such shape
+#    is slow in practice.
+# 2. Adversarial timing: each pattern is run over generated inputs of
+#    growing length, and the growth of its run time is measured. A rule
+#    fails when it scales worse than linearly.
+#
+# Run:  python rule_validator.py    (exit status 1 if a rule fails)
+# -------------------------------
+
+import argparse
+import json
+import math
+import re
+import sys
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from mstp_rules import MSTP_RULES
+
+try:
+    from re import _constants as _sre_constants, _parser as _sre_parse  # Python 3.11+
+except ImportError:  # pragma: no cover - older Pythons
+    import sre_constants as _sre_constants
+    import sre_parse as _sre_parse
+
+MAXREPEAT = _sre_constants.MAXREPEAT
+
+# Run time may grow at most like length ** MAX_EXPONENT
+MAX_EXPONENT = 1.5
+
+# Characters used to decide whether two parts of a pattern can match the
+# same text
+_SAMPLE_CHARS = (
+    [chr(c) for c in range(32, 127)] + ["\t", "\n", "\xa0", "é", "ß", "–", "“", "’", "中", "_"]
+)
+
+
+# -------------------------------
+# STATIC ANALYSIS
+# -------------------------------
+def _category_matches(category: str, ch: str) -> bool:
+    if category.endswith("_NOT_DIGIT"):
+        return not ch.isdigit()
+    if category.endswith("_DIGIT"):
+        return ch.isdigit()
+    if category.endswith("_NOT_SPACE"):
+        return not ch.isspace()
+    if category.endswith("_SPACE"):
+        return ch.isspace()
+    if category.endswith("_NOT_WORD"):
+        return not (ch.isalnum() or ch == "_")
+    if category.endswith("_WORD"):
+        return ch.isalnum() or ch == "_"
+    return True  # unknown: assume it can match
+
+
+def _item_matches(op, arg, ch: str, ignore_case: bool) -> Optional[bool]:
+    """
+    Whether one parsed single-character item matches ch, or None if the item
+    is not a single-character test.
+    """
+    name = str(op)
+    if ignore_case:
+        chars = {ch, ch.lower(), ch.upper()}
+        if len(chars) > 1:
+            results = [_item_matches(op, arg, c, False) for c in chars]
+            return None if None in results else any(results)
+    if name == "LITERAL":
+        return ord(ch) == arg
+    if name == "NOT_LITERAL":
+        return ord(ch) != arg
+    if name == "ANY":
+        return ch != "\n"
+    if name == "RANGE":
+        return arg[0] <= ord(ch) <= arg[1]
+    if name == "CATEGORY":
+        return _category_matches(str(arg), ch)
+    if name == "IN":
+        negate = False
+        found = False
+        for sub_op, sub_arg in arg:
+            if str(sub_op) == "NEGATE":
+                negate = True
+                continue
+            if _item_matches(sub_op, sub_arg, ch, False):
+                found = True
+        return found != negate
+    return None
+
+
+def _first_chars(seq, ignore_case: bool) -> Optional[frozenset]:
+    """
+    Sample characters the parsed pattern `seq` can start with, or None if
+    that cannot be worked out.
+    """
+    for op, arg in seq:
+        name = str(op)
+        if name == "AT":
+            continue
+        if name == "SUBPATTERN":
+            return _first_chars(arg[-1], ignore_case)
+        if name in ("MAX_REPEAT", "MIN_REPEAT", "POSSESSIVE_REPEAT"):
+            return _first_chars(arg[2], ignore_case)
+        if name == "BRANCH":
+            sets = [_first_chars(alt, ignore_case) for alt in arg[1]]
+            return None if None in sets else frozenset().union(*sets)
+        chars = [c for c in _SAMPLE_CHARS if _item_matches(op, arg, c, ignore_case)]
+        if _item_matches(op, arg, "a", ignore_case) is None:
+            return None
+        return frozenset(chars)
+    return None
+
+
+def _is_unbounded(op, arg) -> bool:
+    return str(op) in ("MAX_REPEAT", "MIN_REPEAT") and arg[1] == MAXREPEAT
+
+
+def _contains_unbounded(seq) -> bool:
+    for op, arg in seq:
+        name = str(op)
+        if _is_unbounded(op, arg):
+            return True
+        if name == "SUBPATTERN" and _contains_unbounded(arg[-1]):
+            return True
+        if name in ("MAX_REPEAT", "MIN_REPEAT") and _contains_unbounded(arg[2]):
+            return True
+        if name == "BRANCH" and any(_contains_unbounded(alt) for alt in arg[1]):
+            return True
+    return False
+
+
+def _walk(seq, ignore_case: bool, warnings: List[str]):
+    previous = None  # the unbounded repeat just before, if any
+    for op, arg in seq:
+        name = str(op)
+        if name in ("MAX_REPEAT", "MIN_REPEAT"):
+            if arg[1] == MAXREPEAT and _contains_unbounded(arg[2]):
+                warnings.append("nested unbounded repeats: exponential backtracking")
+            if arg[1] == MAXREPEAT and previous is not None:
+                a = _first_chars(previous[2], ignore_case)
+                b = _first_chars(arg[2], ignore_case)
+                if a is None or b is None or a & b:
+                    warnings.append("adjacent unbounded repeats can match the same text: "
+                                    "polynomial backtracking")
+            _walk(arg[2], ignore_case, warnings)
+            previous = arg if arg[1] == MAXREPEAT else None
+            continue
+        previous = None
+        if name == "SUBPATTERN":
+            _walk(arg[-1], ignore_case, warnings)
+        elif name == "BRANCH":
+            for alt in arg[1]:
+                _walk(alt, ignore_case, warnings)
+
+
+def _starts_anchored(seq) -> bool:
+    """
+    True if every match must start at a position the engine can rule out at
+    once: a word boundary, a line start or a lookbehind.
+    """
+    for op, arg in seq:
+        name = str(op)
+        if name in ("AT", "ASSERT", "ASSERT_NOT"):
+            return True
+        if name == "SUBPATTERN":
+            return _starts_anchored(arg[-1])
+        if name == "BRANCH":
+            return all(_starts_anchored(alt) for alt in arg[1])
+        return False
+    return False
+
+
+def _leading_repeat(seq) -> bool:
+    """True if the pattern starts with an unbounded repeat."""
+    for op, arg in seq:
+        name = str(op)
+        if name == "SUBPATTERN":
+            return _leading_repeat(arg[-1])
+        if name in ("MAX_REPEAT", "MIN_REPEAT"):
+            return arg[1] == MAXREPEAT or arg[0] >= 2 or _leading_repeat(arg[2])
+        return False
+    return False
+
+
+def analyze_pattern(pattern: re.Pattern) -> List[str]:
+    """
+    Warnings about pattern shapes that can backtrack super-linearly.
+    """
+    try:
+        parsed = _sre_parse.parse(pattern.pattern, pattern.flags)
+    except Exception as e:
+        return [f"could not analyze: {e}"]
+    ignore_case = bool(pattern.flags & re.IGNORECASE)
+    warnings: List[str] = []
+    _walk(parsed, ignore_case, warnings)
+    if _leading_repeat(parsed) and not _starts_anchored(parsed):
+        warnings.append("starts with a repeat and no anchor: every start position rescans "
+                        "the text (quadratic when the match fails)")
+    return list(dict.fromkeys(warnings))
+
+
+# -------------------------------
+# ADVERSARIAL TIMING
+# -------------------------------
+def _repeat_to(unit: str, length: int) -> str:
+    return (unit * (length // len(unit) + 1))[:length]
+
+
+# Inputs that make regexes backtrack: long runs with no match in them,
+# like the huge single-paragraph tables some Flare exports contain
+ADVERSARIAL_INPUTS: Dict[str, Callable[[int], str]] = {
+    "one long word": lambda n: "a" * n,
+    "unpunctuated words": lambda n: _repeat_to("lorem ipsum dolor sit amet ", n),
+    "comma list without and": lambda n: _repeat_to("item, ", n),
+    "spaces": lambda n: " " * n,
+    "digits": lambda n: "9" * n,
+    "word then spaces": lambda n: "is" + " " * (n - 2),
+    "full stops": lambda n: "." * n,
+    "one long line": lambda n: _repeat_to("Select the file and choose Save ", n),
+}
+
+
+def _time_once(pattern: re.Pattern, text: str, loops: int) -> float:
+    start = time.perf_counter()
+    for _ in range(loops):
+        for _ in pattern.finditer(text):
+            pass
+    return (time.perf_counter() - start) / loops
+
+
+def _calibrate(pattern: re.Pattern, text: str, min_seconds: float = 0.0005) -> int:
+    """Loops of finditer over text needed to take at least min_seconds."""
+    once = max(_time_once(pattern, text, 10), 1e-7)
+    return max(1, min(10_000, math.ceil(min_seconds / once)))
+
+
+def scaling_exponent(lengths: Sequence[int], seconds: Sequence[float]) -> float:
+    """
+    Least-squares slope of log(time) over log(length): about 1 for linear
+    run time, 2 for quadratic.
+    """
+    xs = [math.log(n) for n in lengths]
+    ys = [math.log(max(t, 1e-9)) for t in seconds]
+    mx, my = sum(xs) / len(xs), sum(ys) / len(ys)
+    sxx = sum((x - mx) ** 2 for x in xs)
+    return sum((x - mx) * (y - my) for x, y in zip(xs, ys)) / sxx if sxx else 0.0
+
+
+@dataclass
+class InputTiming:
+    input: str
+    lengths: List[int]
+    seconds: List[float]
+    exponent: float
+
+
+@dataclass
+class RuleReport:
+    rule_id: str
+    pattern: str
+    warnings: List[str]
+    timings: List[InputTiming] = field(default_factory=list)
+    max_exponent: float = MAX_EXPONENT
+
+    @property
+    def worst(self) -> Optional[InputTiming]:
+        return max(self.timings, key=lambda t: t.exponent, default=None)
+
+    @property
+    def ok(self) -> bool:
+        worst = self.worst
+        return worst is None or worst.exponent <= self.max_exponent
+
+
+def time_pattern(pattern: re.Pattern, start_length: int = 1000, max_length: int = 16_000,
+                 budget: float = 0.02, repeats: int = 3) -> List[InputTiming]:
+    """
+    Time the pattern on every adversarial input, doubling the length from
+    start_length up to max_length, or until one run takes more than
+    `budget` seconds (a slow pattern is already found by then). Each
+    length keeps the best of `repeats` timings.
+    """
+    timings = []
+    for name, make in ADVERSARIAL_INPUTS.items():
+        lengths, seconds = [], []
+        length = start_length
+        # Short inputs are looped for precision; at least linear time
+        # means half the loops are enough each time the length doubles
+        loops = _calibrate(pattern, make(length))
+        while length <= max_length:
+            text = make(length)
+            elapsed = _time_once(pattern, text, loops)
+            if elapsed <= budget:
+                elapsed = min([elapsed] + [_time_once(pattern, text, loops) for _ in range(repeats - 1)])
+            lengths.append(length)
+            seconds.append(elapsed)
+            if elapsed > budget and len(lengths) >= 3:
+                break
+            length *= 2
+            loops = max(1, loops // 2)
+        timings.append(InputTiming(name, lengths, seconds, scaling_exponent(lengths, seconds)))
+    return timings
+
+
+def validate_rules(rules: Sequence[Dict[str, Any]] = MSTP_RULES, max_exponent: float = MAX_EXPONENT,
+                   **timing_options) -> List[RuleReport]:
+    """
+    Analyze and time every rule. timing_options go to time_pattern.
+    """
+    reports = []
+    for rule in rules:
+        pattern = rule["pattern"]
+        reports.append(RuleReport(
+            rule_id=rule["id"],
+            pattern=pattern.pattern,
+            warnings=analyze_pattern(pattern),
+            timings=time_pattern(pattern, **timing_options),
+            max_exponent=max_exponent,
+        ))
+    return reports
+
+
+# -------------------------------
+# COMMAND LINE
+# -------------------------------
+def format_reports(reports: Sequence[RuleReport]) -> str:
+    lines = []
+    for report in reports:
+        worst = report.worst
+        status = "ok  " if report.ok else "FAIL"
+        scaling = f"n^{worst.exponent:.2f} on {worst.input}" if worst else "not timed"
+        lines.append(f"{status} {report.rule_id:<24} {scaling}")
+        if not report.ok:
+            lines.append(f"       pattern: {report.pattern}")
+            lines.append("       " + ", ".join(
+                f"{n}: {t * 1000:.1f} ms" for n, t in zip(worst.lengths, worst.seconds)))
+        for warning in report.warnings:
+            lines.append(f"       warning: {warning}")
+    return "\n".join(lines)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Check the MSTP rule patterns for ReDoS.")
+    parser.add_argument("--max-length", type=int, default=16_000,
+                        help="longest adversarial input, in characters (default: 16000)")
+    parser.add_argument("--max-exponent", type=float, default=MAX_EXPONENT,
+                        help=f"fail above run time ~ length ** this (default: {MAX_EXPONENT})")
+    parser.add_argument("--json", action="store_true", help="print the reports as JSON")
+    args = parser.parse_args(argv)
+
+    reports = validate_rules(MSTP_RULES, args.max_exponent, max_length=args.max_length)
+    if args.json:
+        print(json.dumps([dict(asdict(r), ok=r.ok) for r in reports], indent=2))
+    else:
+        print(format_reports(reports))
+    failed = [r.rule_id for r in reports if not r.ok]
+    if failed:
+        print(f"\n{len(failed)} rule(s) scale worse than linearly: {', '.join(failed)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,12 +3,22 @@
 # Users can upload a MadCap Flare HTML file, see suggested MSTP & grammar changes,
 # accept/reject each suggestion, and save the cleaned HTML back.
 
+import hashlib                    # To key cached results by file content
+
 import streamlit as st            # Streamlit library to create web apps
 import pandas as pd               # Pandas for handling tables of suggestions
-from bs4 import BeautifulSoup     # BeautifulSoup to parse HTML
 
 # Import custom functions from processors.py
-from processors import process_html, apply_selected_changes
+from processors import (
+    HTML_PARSERS, StageTimings, apply_selected_changes, default_html_parser, parse_html,
+    process_html_streaming, render_diff_html, rules_version,
+)
+from grammar import get_grammar_cache, grammar_backend_ready, warm_grammar_backend
+
+# Start LanguageTool in the background while the page renders.
+# The script reruns on every interaction, so only do it until it is ready.
+if not grammar_backend_ready():
+    warm_grammar_backend()
 
 # -------------------------------
 # PAGE CONFIGURATION
@@ -27,6 +37,44 @@ st.title("Flare Style Checker - MSTP Rules")
 if "state" not in st.session_state:
     st.session_state.state = {}  # Dictionary to store uploaded file, suggestions, etc.
 
+# -------------------------------
+# CACHED CHECKS
+# -------------------------------
+# Every widget interaction reruns this script. The checks are cached per
+# upload content hash and rule-set version, so editing the table only
+# re-renders it instead of re-parsing the HTML and re-running all checks.
+# cache_resource (not cache_data) is used because the grammar future
+# cannot be copied; callers must copy the DataFrames before changing them.
+@st.cache_resource(max_entries=16, show_spinner="Checking MSTP rules...")
+def start_checks(content_key: str, rules_key: str, parser: str, _content: str):
+    """
+    Run the checks on the upload: returns (mstp_df, grammar_future, timings).
+    _content is not hashed; content_key identifies it.
+    The checks only read the text, so with lxml no BeautifulSoup tree is
+    built here; the soup is parsed when changes are applied.
+    timings gets the grammar stages once grammar_future is done.
+    """
+    timings = StageTimings()
+    if parser == default_html_parser() == "lxml":
+        return (*process_html_streaming(_content, timings), timings)
+    with timings.stage("parse") as stage:
+        soup = parse_html(_content, parser)
+        stage.count = len(_content)
+    return (*process_html_streaming(soup, timings), timings)
+
+
+# -------------------------------
+# HTML PARSER
+# -------------------------------
+# lxml is the fastest and keeps Flare's "MadCap:" markup as written;
+# html.parser is the pure-Python fallback.
+parser = st.sidebar.selectbox(
+    "HTML parser",
+    HTML_PARSERS,
+    index=HTML_PARSERS.index(default_html_parser()),
+)
+
+
 # -------------------------------
 # FILE UPLOADER
 # -------------------------------
@@ -38,17 +86,24 @@ uploaded_file = st.file_uploader(
 
 # If a file is uploaded
 if uploaded_file:
-    content = uploaded_file.read().decode("utf-8")  # Read file content as text
+    content = uploaded_file.read().decode("utf-8-sig")  # Read file content as text, dropping any BOM
     st.session_state.state["original_html"] = content
 
-    # Parse HTML using BeautifulSoup
-    soup = BeautifulSoup(content, "html.parser")
+    # Process HTML (cached): MSTP results come back at once,
+    # grammar results are added when the background check finishes
+    content_key = hashlib.sha256(content.encode("utf-8")).hexdigest()
+    mstp_df, grammar_future, timings = start_checks(content_key, rules_version(), parser, content)
 
-    # Process HTML: check MSTP rules & grammar
-    edited = process_html(soup)
+    grammar_done = grammar_future.done()
+    if grammar_done:
+        edited = grammar_future.result().copy()
+    else:
+        edited = mstp_df.copy()
 
     st.subheader("Suggested Changes")
     st.write("Review each suggested change. Accept or reject before saving.")
+    if not grammar_done:
+        st.info("Grammar check is still running; grammar suggestions will be added when it finishes.")
 
     # -------------------------------
     # DISPLAY TABLE WITH ACCEPT COLUMN
@@ -57,7 +112,7 @@ if uploaded_file:
     edited_display = st.data_editor(
         edited,                  # DataFrame of suggested changes
         use_container_width=True, # Expand table to full width
-        num_rows="dynamic",       # Allow dynamic adding/removing rows
+        num_rows="fixed",         # Rows need a node and position, so none are added by hand
     )
 
     # Store back in session_state
@@ -80,10 +135,20 @@ if uploaded_file:
     # COLUMN 2: Apply changes and save original file
     with col2:
         if st.button("Apply accepted changes and save original file"):
-            cleaned_html, changed = apply_selected_changes(soup, edited_display)
+            # Parse HTML again (only needed when applying changes)
+            soup = parse_html(content, parser)
+            changes = []  # filled with the edits made to the original text
+            cleaned_html, changed, skipped = apply_selected_changes(
+                soup, edited_display, source=content, changes=changes)
             st.session_state.state["cleaned_html"] = cleaned_html
             st.session_state.state["changed"] = changed
+            # Diff only around the known edits (full line diff if they were not spliced)
+            st.session_state.state["diff_html"] = render_diff_html(
+                content, cleaned_html, changes if changes or not changed else None)
             st.success(f"Applied {changed} changes.")
+            if skipped:
+                st.warning(f"Skipped {skipped} changes that overlap another accepted change "
+                           "or no longer match the text.")
 
             # Ask user for file path to save cleaned HTML
             save_path = st.text_input(
@@ -107,3 +172,38 @@ if uploaded_file:
                 file_name=f"cleaned_{uploaded_file.name}",
                 mime="text/html",
             )
+
+    # Show what the applied changes look like in the HTML
+    if st.session_state.state.get("diff_html"):
+        with st.expander("Show changes"):
+            st.markdown(st.session_state.state["diff_html"], unsafe_allow_html=True)
+
+    # Where the time went: the document (parsing, MSTP rules) or the grammar backend
+    with st.expander("Timing"):
+        timing_df = timings.to_frame()
+        timing_df["ms"] = (timing_df.pop("seconds") * 1000).round(1)
+        st.dataframe(timing_df[["stage", "ms", "count", "runs"]], hide_index=True)
+        st.caption(
+            "count: characters (parse), text nodes (extract_text_nodes), "
+            "suggestions (checks) or rows (dedupe, dataframe)."
+            + ("" if grammar_done else " Grammar stages appear when the grammar check finishes.")
+        )
+
+    # Show how much the grammar cache saved, if one is configured
+    grammar_cache = get_grammar_cache()
+    if grammar_cache is not None:
+        cache_stats = grammar_cache.stats()
+        st.sidebar.caption(
+            f"Grammar cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses, "
+            f"{cache_stats['entries']} entries"
+        )
+
+    # -------------------------------
+    # WAIT FOR GRAMMAR RESULTS
+    # -------------------------------
+    # The page above is already shown with the MSTP results.
+    # Once grammar checking finishes, rerun so its suggestions are included.
+    if not grammar_done:
+        with st.spinner("Checking grammar..."):
+            grammar_future.result()
+        st.rerun()
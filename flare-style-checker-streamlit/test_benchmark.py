@@ -0,0 +1,37 @@
+from benchmark import STAGES, compare_results, run_benchmarks
+from flare_corpus import CorpusConfig, generate_topic
+from processors import extract_text_nodes, parse_html
+
+
+def test_generated_topics_are_repeatable_flare_xhtml():
+    config = CorpusConfig(nodes=80, depth=4, issue_density=0.5)
+    topic = generate_topic(config, 3)
+    assert topic == generate_topic(config, 3)
+    assert topic != generate_topic(config, 4)
+    nodes = extract_text_nodes(parse_html(topic))
+    assert abs(len(nodes) - config.nodes) < 10
+    assert any("MadCap:" in ref.path for ref in nodes)
+
+
+def test_benchmark_results_cover_every_stage():
+    results = run_benchmarks([CorpusConfig(nodes=20)], repeats=2, warmup=0)
+    (case,) = results["cases"]
+    assert list(case["stages"]) == list(STAGES)
+    for stage in case["stages"].values():
+        assert len(stage["samples"]) == 2
+        assert stage["min"] <= stage["median"]
+    assert results["meta"]["repeats"] == 2
+
+
+def _results(median, iqr, peak):
+    stage = {"median": median, "iqr": iqr, "peak_bytes": peak}
+    return {"cases": [{"case": "large", "stages": {"parse_html": stage}}]}
+
+
+def test_compare_flags_only_regressions_beyond_noise():
+    baseline = _results(0.100, 0.004, 1_000_000)
+    assert compare_results(baseline, _results(0.105, 0.004, 1_000_000))[0]["regression"] == []
+    # 20% slower, but within the spread of the samples
+    assert compare_results(baseline, _results(0.120, 0.030, 1_000_000))[0]["regression"] == []
+    assert compare_results(baseline, _results(0.120, 0.004, 1_000_000))[0]["regression"] == ["time"]
+    assert compare_results(baseline, _results(0.100, 0.004, 1_500_000))[0]["regression"] == ["memory"]
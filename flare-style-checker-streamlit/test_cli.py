@@ -0,0 +1,117 @@
+import codecs
+
+import pytest
+
+from cli import find_topics, main
+from flare_corpus import CorpusConfig, write_project
+from grammar import GrammarConfig, configure_grammar, get_grammar_config
+from langtool_stub import start_stub_server
+from mstp_rules import MSTP_RULES
+
+TOPIC = (
+    '<?xml version="1.0" encoding="utf-8"?>\r\n'
+    '<html xmlns:MadCap="http://www.madcapsoftware.com/Schemas/MadCap.xsd">\r\n'
+    "    <body>\r\n"
+    '        <p class="step">Send an e-mail to <MadCap:variable name="General.Admin" />&#160;today.</p>\r\n'
+    "        <p>Click on Save, which closes the dialog.</p>\r\n"
+    "    </body>\r\n"
+    "</html>\r\n"
+)
+
+
+@pytest.fixture
+def project(tmp_path):
+    write_project(tmp_path / "Project", CorpusConfig(nodes=40, issue_density=0.5), topics=6)
+    return tmp_path / "Project"
+
+
+def _report(project, tmp_path, *args):
+    out = tmp_path / "report.csv"
+    assert main([str(project), "--no-grammar", "-o", str(out), *args]) == 0
+    return out.read_text(encoding="utf-8")
+
+
+def _cache_counts(capsys):
+    err = capsys.readouterr().err
+    hits, misses = err.split("grammar cache: ")[1].split(" misses")[0].split(" hits, ")
+    return int(hits), int(misses)
+
+
+def _reused(capsys):
+    err = capsys.readouterr().err
+    return int(err.split("suggestions, ")[1].split(" unchanged")[0])
+
+
+def test_topics_are_found_under_content(project):
+    (project / "Notes.htm").write_text("<p>Outside Content</p>", encoding="utf-8")
+    (project / "Content" / "Topics" / "Image.png").write_bytes(b"")
+    topics = find_topics(project)
+    assert len(topics) == 6
+    assert all(p.suffix == ".htm" and "Content" in p.parts for p in topics)
+    assert topics == sorted(topics)
+
+
+def test_worker_processes_give_the_same_report(project, tmp_path):
+    single = _report(project, tmp_path)
+    assert single.count("\n") > 6
+    assert _report(project, tmp_path, "-j", "2") == single
+
+
+def test_manifest_reuses_only_unchanged_topics(project, tmp_path, capsys, monkeypatch):
+    manifest = str(tmp_path / "manifest.json")
+    first = _report(project, tmp_path, "--manifest", manifest)
+    capsys.readouterr()
+
+    assert _report(project, tmp_path, "--manifest", manifest) == first
+    assert _reused(capsys) == 6
+
+    # Editing one topic checks only that topic again
+    topic = find_topics(project)[2]
+    topic.write_text(topic.read_text(encoding="utf-8").replace("</body>", "<p>Click on OK.</p></body>"),
+                     encoding="utf-8")
+    assert _report(project, tmp_path, "--manifest", manifest) != first
+    assert _reused(capsys) == 5
+
+    # Changing a rule invalidates every topic
+    rule = next(r for r in MSTP_RULES if r["id"] == "avoid-click-on")
+    monkeypatch.setitem(rule, "repl", "select")
+    assert "select" in _report(project, tmp_path, "--manifest", manifest)
+    assert _reused(capsys) == 0
+
+
+def test_fix_rewrites_only_selected_spans_and_keeps_bom(tmp_path):
+    topic = tmp_path / "Project" / "Content" / "Topic.htm"
+    topic.parent.mkdir(parents=True)
+    original = codecs.BOM_UTF8 + TOPIC.encode("utf-8")
+    topic.write_bytes(original)
+
+    report = _report(tmp_path / "Project", tmp_path, "--fix", "--fix-rules", "use-email")
+    assert "avoid-click-on" in report  # reported, not applied
+    assert topic.read_bytes() == original.replace(b"e-mail", b"email")
+
+
+def test_fix_needs_rule_names(project, capsys):
+    before = [p.read_bytes() for p in find_topics(project)]
+    assert main([str(project), "--no-grammar", "--fix", "-o", "-"]) == 2
+    assert "--fix-rules" in capsys.readouterr().err
+    assert [p.read_bytes() for p in find_topics(project)] == before
+
+
+def test_cache_counts_include_worker_processes(project, tmp_path, capsys, monkeypatch):
+    server, url = start_stub_server()
+    monkeypatch.setenv("FLARE_GRAMMAR_BACKEND", "local")
+    monkeypatch.setenv("FLARE_LANGUAGETOOL_URL", url)
+    monkeypatch.setenv("FLARE_GRAMMAR_CACHE", str(tmp_path / "grammar.sqlite"))
+    config = get_grammar_config()
+    configure_grammar(GrammarConfig.from_env())
+    out = str(tmp_path / "report.csv")
+    try:
+        assert main([str(project), "-j", "2", "-o", out]) == 0
+        hits, misses = _cache_counts(capsys)
+        assert misses > 0
+        assert main([str(project), "-j", "1", "-o", out]) == 0
+        assert _cache_counts(capsys) == (hits + misses, 0)
+    finally:
+        configure_grammar(config)
+        server.shutdown()
+        server.server_close()
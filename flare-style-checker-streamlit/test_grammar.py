@@ -0,0 +1,229 @@
+import threading
+from dataclasses import replace
+from pathlib import Path
+
+from bs4 import BeautifulSoup
+
+import grammar
+from grammar import (
+    BACKEND_DOWN_AFTER, GrammarConfig, GrammarMatch, LocalServerBackend, check_texts, configure_grammar,
+    get_grammar_cache, get_grammar_config, make_batches, stats, warm_grammar_backend,
+)
+from grammar_cache import GrammarCache
+from langtool_stub import check_text, start_stub_server
+from processors import extract_text_nodes, process_html
+
+SAMPLE = Path(__file__).with_name("sample_flare_topic_with_issues.html")
+
+
+class StubBackend:
+    """In-process backend using the stub rules, counting requests."""
+
+    version = "stub"
+
+    def __init__(self):
+        self.requests = 0
+
+    def check(self, text):
+        self.requests += 1
+        return [
+            GrammarMatch(m["offset"], m["length"], m["rule"]["id"], m["message"],
+                         [r["value"] for r in m["replacements"]])
+            for m in check_text(text)
+        ]
+
+
+class FlakyBackend(StubBackend):
+    """Fails every request whose text contains 'boom'."""
+
+    def check(self, text):
+        if "boom" in text:
+            self.requests += 1
+            raise ConnectionError("boom")
+        return super().check(text)
+
+
+def _sample_texts():
+    with open(SAMPLE, encoding="utf-8") as f:
+        soup = BeautifulSoup(f.read(), "html.parser")
+    texts = [str(ref.node) for ref in extract_text_nodes(soup)]
+    # Add texts with several issues each, including repeated words
+    texts += [
+        "i think  this is is alot of text",
+        "Use atleast two threads.  i agree",
+        "the the",
+        "end with a word word",
+    ] * 25
+    return texts
+
+
+def _key(matches):
+    return [(m.offset, m.errorLength, m.ruleId, m.replacements) for m in matches]
+
+
+def test_batched_offsets_match_unbatched_results():
+    texts = _sample_texts()
+    backend = StubBackend()
+    unbatched = [_key(backend.check(t)) for t in texts]
+
+    for max_chars in (1, 50, 400, 100000):
+        batched = check_texts(StubBackend(), texts, max_chars=max_chars)
+        assert [_key(m) for m in batched] == unbatched
+        for text, matches in zip(texts, batched):
+            for m in matches:
+                assert 0 <= m.offset and m.offset + m.errorLength <= len(text)
+
+
+def test_matches_across_separator_are_dropped():
+    # "word" ends one text and starts the next: the stub's repeated-word
+    # rule matches across the separator, which must not be reported.
+    texts = ["first word", "word second"]
+    results = check_texts(StubBackend(), texts, max_chars=1000)
+    assert results == [[], []]
+
+
+def test_batches_respect_size_limit_and_order():
+    texts = ["x" * 30] * 10 + ["y" * 200] + ["z"]
+    batches = make_batches(texts, max_chars=100)
+    assert [i for b in batches for i in b.indexes] == list(range(len(texts)))
+    for b in batches:
+        assert len(b.text) <= 100 or len(b.indexes) == 1
+        for i, start in zip(b.indexes, b.starts):
+            assert b.text[start:start + len(texts[i])] == texts[i]
+
+
+def test_local_server_batches_cut_request_count():
+    server, url = start_stub_server()
+    try:
+        texts = _sample_texts()
+        backend = LocalServerBackend(url)
+        results = check_texts(backend, texts, max_chars=15000)
+        assert server.request_count == 1
+        assert [_key(m) for m in results] == [_key(StubBackend().check(t)) for t in texts]
+        backend.close()
+    finally:
+        server.shutdown()
+
+
+def test_concurrent_checks_keep_node_order():
+    texts = _sample_texts()
+    expected = [_key(StubBackend().check(t)) for t in texts]
+    results = check_texts(StubBackend(), texts, max_chars=60, concurrency=8)
+    assert [_key(m) for m in results] == expected
+
+
+def test_failed_batch_falls_back_to_single_texts():
+    config = get_grammar_config()
+    configure_grammar(replace(config, backoff=0.0))
+    try:
+        stats.reset()
+        texts = ["i agree", "boom i fail", "the the end"]
+        results = check_texts(FlakyBackend(), texts, max_chars=1000, concurrency=2)
+        assert [_key(m) for m in results] == [
+            _key(StubBackend().check("i agree")), [], _key(StubBackend().check("the the end")),
+        ]
+        assert stats.failed_batches == 1
+        assert stats.failed_texts == 1
+        assert stats.retries == config.retries
+    finally:
+        configure_grammar(config)
+
+
+def test_failing_first_text_does_not_skip_the_batch():
+    config = get_grammar_config()
+    configure_grammar(replace(config, backoff=0.0))
+    try:
+        stats.reset()
+        results = check_texts(FlakyBackend(), ["boom first", "i agree", "the the end"], max_chars=1000)
+        assert [_key(m) for m in results] == [
+            [], _key(StubBackend().check("i agree")), _key(StubBackend().check("the the end")),
+        ]
+        assert stats.failed_texts == 1
+
+        # Only several failures in a row mean the backend is down
+        stats.reset()
+        backend = FlakyBackend()
+        texts = ["boom"] * BACKEND_DOWN_AFTER + ["i agree"] * 5
+        assert check_texts(backend, texts, max_chars=1000) == [[]] * len(texts)
+        assert stats.failed_texts == len(texts)
+        assert backend.requests == 1 + config.retries + BACKEND_DOWN_AFTER
+    finally:
+        configure_grammar(config)
+
+
+def test_cache_reuses_results_and_keeps_offsets(tmp_path):
+    cache = GrammarCache(str(tmp_path / "grammar.sqlite"))
+    texts = ["  Click OK to continue i think", "Click OK to continue i think\n", "the the end"]
+    expected = [_key(StubBackend().check(t)) for t in texts]
+
+    backend = StubBackend()
+    first = check_texts(backend, texts, cache=cache)
+    assert [_key(m) for m in first] == expected
+    assert cache.misses == 2 and cache.hits == 0
+
+    backend = StubBackend()
+    second = check_texts(backend, texts, cache=cache)
+    assert [_key(m) for m in second] == expected
+    assert backend.requests == 0
+    assert cache.hits == 2
+
+
+def test_cache_needs_a_backend_version(tmp_path):
+    cache = GrammarCache(str(tmp_path / "grammar.sqlite"))
+    backend = StubBackend()
+    backend.version = ""  # e.g. the public API backend
+    for _ in range(2):
+        check_texts(backend, ["the the end"], cache=cache)
+    assert backend.requests == 2
+    assert cache.hits == cache.misses == 0
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = GrammarCache(str(tmp_path / "grammar.sqlite"), max_entries=2)
+    cache.put_many([("a", []), ("b", [])])
+    cache.get_many(["a"])
+    cache.put_many([("c", [])])
+    assert set(cache.get_many(["a", "b", "c"])) == {"a", "c"}
+    assert cache.evictions == 1
+
+
+def test_cache_is_skipped_when_the_server_is_down(tmp_path):
+    server, url = start_stub_server()
+    server.shutdown()
+    server.server_close()
+    config = get_grammar_config()
+    configure_grammar(GrammarConfig(backend="local", server_url=url, retries=0, backoff=0.0,
+                                    cache_path=str(tmp_path / "grammar.sqlite")))
+    try:
+        # The version lookup fails too, but the MSTP results still come back
+        df = process_html("<p>Click on the the OK.</p>")
+        assert list(df["rule_id"]) == ["avoid-click-on"]
+    finally:
+        configure_grammar(config)
+
+
+def test_warmup_starts_one_thread():
+    config = get_grammar_config()
+    configure_grammar(GrammarConfig(backend="none"))
+    try:
+        first = warm_grammar_backend()
+        first.join()
+        assert warm_grammar_backend() is first  # already built
+        configure_grammar(GrammarConfig(backend="none"))
+        assert warm_grammar_backend() is not first  # a new config is built again
+    finally:
+        configure_grammar(config)
+
+
+def test_cache_does_not_wait_for_the_backend(tmp_path):
+    config = get_grammar_config()
+    configure_grammar(GrammarConfig(backend="none", cache_path=str(tmp_path / "grammar.sqlite")))
+    found = []
+    try:
+        with grammar._backend_lock:  # as while LanguageTool is starting
+            opener = threading.Thread(target=lambda: found.append(get_grammar_cache()))
+            opener.start()
+            opener.join(timeout=5)
+        assert found and found[0] is not None
+    finally:
+        configure_grammar(config)
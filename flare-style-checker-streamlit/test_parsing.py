@@ -0,0 +1,104 @@
+import pytest
+
+from grammar import GrammarConfig, configure_grammar
+from processors import (
+    apply_selected_changes, extract_report_nodes, extract_text_nodes, parse_html, process_html,
+)
+
+configure_grammar(GrammarConfig(backend="none"))
+
+# A Flare topic as the XML editor saves it: namespaced MadCap elements and
+# attributes, condition tags, snippets, variables, cross-references and
+# drop-downs, with self-closing elements and character references.
+FLARE_TOPIC = """<?xml version="1.0" encoding="utf-8"?>
+<html xmlns:MadCap="http://www.madcapsoftware.com/Schemas/MadCap.xsd" MadCap:conditions="Default.PrintOnly">
+    <head>
+        <link href="../Resources/Stylesheets/Styles.css" rel="stylesheet" type="text/css" />
+    </head>
+    <body>
+        <h1 MadCap:conditions="Default.ScreenOnly,Product.Pro">Install the Widget</h1>
+        <MadCap:snippetBlock src="../Resources/Snippets/Note.flsnp" />
+        <p class="step first">Click on <MadCap:variable name="General.ProductName" />&#160;to open it.</p>
+        <p>See <MadCap:xref href="Install.htm#Top">Installation</MadCap:xref> for details.</p>
+        <MadCap:dropDown>
+            <MadCap:dropDownHead>
+                <MadCap:dropDownHotspot>More options</MadCap:dropDownHotspot>
+            </MadCap:dropDownHead>
+            <MadCap:dropDownBody>
+                <p>Click on <MadCap:snippetText src="../Resources/Snippets/Save.flsnp" /> when done.</p>
+            </MadCap:dropDownBody>
+        </MadCap:dropDown>
+    </body>
+</html>"""
+
+
+@pytest.mark.parametrize("parser", ["lxml", "html.parser"])
+def test_text_nodes_do_not_depend_on_parser(parser):
+    reference = [(ref.path, str(ref.node)) for ref in extract_text_nodes(parse_html(FLARE_TOPIC, "lxml"))]
+    nodes = [(ref.path, str(ref.node)) for ref in extract_text_nodes(parse_html(FLARE_TOPIC, parser))]
+    # html.parser lowercases "MadCap:" and also reports the XML declaration
+    # as text; everything else matches
+    nodes = [(path.lower(), text) for path, text in nodes if not text.startswith("xml ")]
+    assert nodes == [(path.lower(), text) for path, text in reference]
+    assert ("[document] > html > body > p > MadCap:xref", "Installation") in reference
+    assert ("[document] > html > body > p.step.first", "Click on ") in reference
+
+
+def test_lxml_round_trip_keeps_flare_markup():
+    html = str(parse_html(FLARE_TOPIC, "lxml"))
+    assert html.startswith('<?xml version="1.0" encoding="utf-8"?>')
+    for markup in [
+        'xmlns:MadCap="http://www.madcapsoftware.com/Schemas/MadCap.xsd"',
+        'MadCap:conditions="Default.PrintOnly"',
+        '<h1 MadCap:conditions="Default.ScreenOnly,Product.Pro">',
+        '<MadCap:snippetBlock src="../Resources/Snippets/Note.flsnp"/>',
+        '<MadCap:variable name="General.ProductName"/>',
+        '<MadCap:xref href="Install.htm#Top">Installation</MadCap:xref>',
+        "<MadCap:dropDownHotspot>More options</MadCap:dropDownHotspot>",
+        '<MadCap:snippetText src="../Resources/Snippets/Save.flsnp"/>',
+        '<p class="step first">',
+    ]:
+        assert markup in html
+    # Parsing the output again gives the same document
+    assert str(parse_html(html, "lxml")) == html
+
+
+def test_applied_changes_keep_flare_markup():
+    df = process_html(parse_html(FLARE_TOPIC))
+    assert set(df["rule_id"]) == {"avoid-click-on"}
+    html, applied, skipped = apply_selected_changes(parse_html(FLARE_TOPIC), df)
+    assert (applied, skipped) == (2, 0)
+    assert '<p class="step first">click <MadCap:variable name="General.ProductName"/>\xa0to open it.</p>' in html
+    assert '<p>click <MadCap:snippetText src="../Resources/Snippets/Save.flsnp"/> when done.</p>' in html
+    assert "madcap:" not in html
+
+
+@pytest.mark.parametrize("html", [
+    FLARE_TOPIC,
+    "<!DOCTYPE html>\n<!-- note --><html><head><style>p {}</style></head>"
+    "<body><p class='a  b'>Click on <b>OK</b>&nbsp;now<br>then close it.</p></body></html>",
+])
+def test_report_nodes_match_soup_nodes(html):
+    expected = [(ref.node_id, ref.path, str(ref.node)) for ref in extract_text_nodes(parse_html(html))]
+    nodes = extract_report_nodes(html)
+    assert [(ref.node_id, ref.path, ref.node) for ref in nodes] == expected
+    assert all(type(ref.node) is str for ref in nodes)
+    assert all(ref.line for ref in nodes if ref.path != "[document]")
+    # Report-only checks give the same suggestions
+    assert process_html(html).equals(process_html(parse_html(html)))
+
+
+def test_html_without_xml_declaration_uses_html_parser_rules():
+    soup = parse_html("<p>Click&nbsp;on <b>Save</b><br></p>", "lxml")
+    assert str(soup.p) == "<p>Click\xa0on <b>Save</b><br/></p>"
+
+
+def test_unknown_parser_is_rejected():
+    with pytest.raises(ValueError):
+        parse_html(FLARE_TOPIC, "html5")
+
+
+def test_byte_order_mark_keeps_flare_parsing():
+    paths = [ref.path for ref in extract_text_nodes(parse_html("\ufeff" + FLARE_TOPIC, "lxml"))]
+    assert paths == [ref.path for ref in extract_text_nodes(parse_html(FLARE_TOPIC, "lxml"))]
+    assert "[document] > html > body > p > MadCap:xref" in paths
@@ -0,0 +1,179 @@
+from pathlib import Path
+
+from bs4 import BeautifulSoup
+
+from grammar import GrammarConfig, configure_grammar
+from mstp_rules import MSTP_RULES
+from processors import (
+    StageTimings, apply_mstp_rules_to_nodes, apply_selected_changes, apply_source_changes,
+    apply_span_edits, dedupe_rows, dedupe_suggestions, extract_text_nodes, iter_findings, mstp_rows,
+    process_html, render_diff_html, suggestions_frame,
+)
+from rule_engine import RuleProfiler
+
+configure_grammar(GrammarConfig(backend="none"))
+
+SAMPLE = Path(__file__).with_name("sample_flare_topic_with_issues.html")
+
+HTML = (
+    "<html><body>"
+    "<p>Read the intro first.</p>"
+    "<p>Click on Save.</p>"
+    "<p>Then click on Close.</p>"
+    "</body></html>"
+)
+
+
+def test_node_ids_follow_extraction_order():
+    nodes = extract_text_nodes(BeautifulSoup(HTML, "html.parser"))
+    assert [ref.node_id for ref in nodes] == list(range(len(nodes)))
+    # All three <p> share one path, but their ids differ
+    assert len({ref.path for ref in nodes}) == 1
+
+
+def test_changes_land_on_their_own_node():
+    df = process_html(BeautifulSoup(HTML, "html.parser"))
+    # Accept only the change for the third paragraph
+    df["apply"] = df["node_id"] == 2
+    html, applied, skipped = apply_selected_changes(BeautifulSoup(HTML, "html.parser"), df)
+    assert (applied, skipped) == (1, 0)
+    assert "<p>Click on Save.</p>" in html
+    assert "<p>Then click Close.</p>" in html
+
+
+def test_rows_without_a_position_are_skipped():
+    df = process_html(BeautifulSoup(HTML, "html.parser"))
+    df["apply"] = False
+    # A row added by hand: path and text, but no node or offsets
+    df.loc[len(df)] = {"type": "MSTP", "path": "[document] > html > body > p",
+                       "before": "Read", "after": "Look at", "apply": True}
+    html, applied, skipped = apply_selected_changes(BeautifulSoup(HTML, "html.parser"), df)
+    assert (applied, skipped) == (0, 1)
+    assert "<p>Read the intro first.</p>" in html
+
+
+def test_span_edits_hit_the_right_occurrence():
+    text = "Click on OK, then click on Close."
+    # Only the second "click on" is accepted
+    new, applied, skipped = apply_span_edits(text, [(18, 26, "click on", "click")])
+    assert new == "Click on OK, then click Close."
+    assert (applied, skipped) == (1, 0)
+
+
+def test_span_edits_skip_overlaps_and_stale_text():
+    text = "one, two and three"
+    edits = [
+        (0, 18, "one, two and three", "one, two, and three"),
+        (0, 3, "one", "1"),
+        (5, 8, "two", "2"),
+        (13, 18, "thre", "3"),  # no longer matches the text
+    ]
+    new, applied, skipped = apply_span_edits(text, edits)
+    assert new == "1, 2 and three"
+    assert (applied, skipped) == (2, 2)
+
+
+def test_precise_fixes_win_over_a_whole_sentence_hit():
+    html = ("<p>The installer copies the files to the program folder, updates the registry "
+            "entries and then sends an e-mail to the administrator of the system.</p>")
+    df = process_html(BeautifulSoup(html, "html.parser"))
+    assert set(df["rule_id"]) == {"use-email", "short-sentences"}
+    df["apply"] = True  # the app accepts every row by default
+    new, applied, skipped = apply_selected_changes(BeautifulSoup(html, "html.parser"), df)
+    assert new == html.replace("e-mail", "email")
+    assert (applied, skipped) == (1, 1)
+
+
+def test_streamed_findings_match_process_html():
+    with open(SAMPLE, encoding="utf-8") as f:
+        html = f.read()
+    df = process_html(BeautifulSoup(html, "html.parser"))
+    streamed = list(iter_findings(BeautifulSoup(html, "html.parser")))
+    key = ["node_id", "start", "rule_id"]
+    assert [f["node_id"] for f in streamed] == sorted(f["node_id"] for f in streamed)
+    assert sorted(tuple(f[k] for k in key) for f in streamed) == \
+        sorted(df[key].itertuples(index=False, name=None))
+
+
+def test_changes_are_spliced_into_the_source():
+    source = (
+        "<html>\n<body  class='x'>\n"
+        "  <p title=\"a > b\">Click on&nbsp;OK &amp; then click on Close.</p>\r\n"
+        "  <br>\n<!-- click on this -->\n</body></html>"
+    )
+    df = process_html(BeautifulSoup(source, "html.parser"))
+    html, applied, skipped = apply_selected_changes(
+        BeautifulSoup(source, "html.parser"), df, source=source)
+    assert (applied, skipped) == (len(df), 0)
+    # Only the changed text differs; markup, entities and line endings are kept
+    assert html == source.replace("Click on&nbsp;OK &amp;", "click&nbsp;OK and").replace(
+        "then click on Close", "then click Close").replace("click on this", "click this")
+
+
+def test_unlocated_source_falls_back_to_serializing():
+    source = "<p>Click on &notit OK</p>"  # html.unescape reads "&not" + "it"
+    df = process_html(BeautifulSoup(source, "html.parser"))
+    df["apply"] = df["rule_id"] == "avoid-click-on"
+    html, applied, _ = apply_selected_changes(BeautifulSoup(source, "html.parser"), df, source=source)
+    assert applied == 1
+    assert html == "<p>click &amp;notit OK</p>"
+
+
+def test_diff_shows_only_changed_lines():
+    source = "\n".join(["<p>intro</p>"] * 20 + ["<p>Click on OK &amp; <b>go</b></p>"] + ["<p>end</p>"] * 20)
+    start = source.index("Click on")
+    changes = [(start, start + len("Click on"), "click")]
+    diff = render_diff_html(source, apply_source_changes(source, changes), changes, context=1)
+    assert "⋯ 19 unchanged lines" in diff and "⋯ 19 unchanged lines" in diff.split("@@")[-1]
+    assert "@@ line 20 @@" in diff
+    assert ">Click on</del> OK &amp;amp; &lt;b&gt;go&lt;/b&gt;" in diff
+    assert ">click</ins> OK" in diff
+    assert diff.count("\n") == 8
+
+
+def test_suggestion_rows_are_deduplicated_into_a_categorical_frame():
+    nodes = extract_text_nodes(BeautifulSoup(HTML, "html.parser"))
+    rows = mstp_rows(nodes)
+    assert dedupe_rows(rows + rows) == rows
+    suggestions = apply_mstp_rules_to_nodes(nodes)
+    assert dedupe_suggestions(suggestions + suggestions) == suggestions
+    df = suggestions_frame(rows)
+    assert len(df) == len(rows)
+    for column in ("type", "rule_id", "description", "path"):
+        assert df[column].dtype == "category"
+    assert df["apply"].all()
+
+
+def test_timings_record_each_stage():
+    timings = StageTimings()
+    df = process_html(HTML, timings=timings)
+    assert df.equals(process_html(HTML))
+    stages = timings.stages
+    assert list(stages) == ["parse", "extract_text_nodes", "mstp_rules", "short_sentences",
+                            "dedupe", "grammar", "dataframe"]
+    assert stages["extract_text_nodes"]["count"] == 3
+    assert stages["grammar"]["count"] is None  # grammar checks are turned off
+    assert stages["dataframe"]["count"] == len(df)
+    assert timings.total() == sum(s["seconds"] for s in stages.values())
+
+
+def test_rule_profiler_counts_every_node():
+    nodes = extract_text_nodes(BeautifulSoup(HTML, "html.parser"))
+    profiler = RuleProfiler()
+    found = apply_mstp_rules_to_nodes(nodes, profiler=profiler)
+    # Profiling bypasses the memo, so a second run is counted in full too
+    assert apply_mstp_rules_to_nodes(nodes, profiler=profiler) == found
+    stats = profiler.stats
+    assert profiler.texts == 2 * len(nodes)
+    assert stats["avoid-click-on"]["calls"] == 4 and stats["avoid-click-on"]["matches"] == 4
+    assert stats["use-email"]["calls"] == 0  # skipped by the trigger regex
+    assert profiler.rows()[0]["seconds"] >= profiler.rows()[-1]["seconds"]
+    assert "avoid-click-on" in profiler.format_table()
+
+
+def test_editing_a_rule_invalidates_the_memo(monkeypatch):
+    nodes = extract_text_nodes(BeautifulSoup(HTML, "html.parser"))
+    assert {s["after"] for s in apply_mstp_rules_to_nodes(nodes)} == {"click"}
+    rule = next(r for r in MSTP_RULES if r["id"] == "avoid-click-on")
+    monkeypatch.setitem(rule, "repl", "select")
+    assert {s["after"] for s in apply_mstp_rules_to_nodes(nodes)} == {"select"}
@@ -0,0 +1,28 @@
+import random
+
+from mstp_rules import MSTP_RULES
+from rule_engine import RuleEngine
+
+ENGINE = RuleEngine(MSTP_RULES)
+
+WORDS = [
+    "Click on", "CLICK ON", "e-mail", "E-Mail", "internet", "Internet", "LOGİN", "login",
+    "setup", "SetUp", "ok", "OK", "which", "etc.", "&", "“", "”", "ﬁle", "straße", "K",
+    "the", "button", "  ", ".", ",", "\n", "log-in", "Log In", "web site", "WEBSITE",
+]
+
+
+def _finditer_loop(text):
+    return [
+        (rule["id"], m.span())
+        for rule in MSTP_RULES
+        for m in rule["pattern"].finditer(text)
+    ]
+
+
+def test_scan_matches_running_every_rule():
+    rng = random.Random(7)
+    texts = ["LOGİN to the site.", "Press ＯＫ or click ON it."]
+    texts += [" ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 12))) for _ in range(500)]
+    for text in texts:
+        assert list(ENGINE.scan(text)) == _finditer_loop(text), text
@@ -0,0 +1,24 @@
+import re
+
+from mstp_rules import MSTP_RULES
+from rule_validator import analyze_pattern, scaling_exponent, time_pattern, validate_rules
+
+
+def test_mstp_rules_scale_linearly():
+    reports = validate_rules(MSTP_RULES, max_length=8000)
+    assert [r.rule_id for r in reports if not r.ok] == []
+
+
+def test_backtracking_patterns_are_caught():
+    assert any("nested" in w for w in analyze_pattern(re.compile(r"(a+)+b")))
+    # The old short-sentences pattern rescans the text from every position
+    old = re.compile(r"(.{120,}?)\.")
+    assert any("no anchor" in w for w in analyze_pattern(old))
+    worst = max(time_pattern(old, max_length=4000), key=lambda t: t.exponent)
+    assert worst.exponent > 1.5
+    assert analyze_pattern(re.compile(r"\bclick on\b")) == []
+
+
+def test_scaling_exponent():
+    assert round(scaling_exponent([1, 2, 4], [1, 2, 4]), 6) == 1
+    assert round(scaling_exponent([1, 2, 4], [1, 4, 16]), 6) == 2